@@ -9,6 +9,20 @@ from sqlalchemy.future import select
 from database import create_tables, async_session_maker, FRONTEND_URL
 from models import Category, MenuItem
 from routes.menu import get_default_menu
+from menu_import import upsert_menu
+from menu_changes import get_menu_revision, record_menu_change
+from order_items import count_orders_missing_items
+from order_ingest import order_ingest
+from idempotency import idempotency_store
+from payment_gateway import payment_gateway
+from payment_events import payment_event_worker
+from auth import password_hasher, principal_cache
+from backplane import backplane
+from discounts import discount_engine
+from kitchen import kitchen_board
+from kitchen_eta import kitchen_eta
+from menu_cache import menu_cache
+from order_stats import order_counters
 from routes import menu, orders, admin, websockets
 
 # Initialize FastAPI app
@@ -36,6 +50,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Menu-Revision", "X-Next-Cursor"],
 )
 
 # Safe mounting of static directory (handles read-only filesystems gracefully)
@@ -79,6 +94,14 @@ if frontend_path.exists():
 
 # ===================== STARTUP EVENT =====================
 
+def subscribe_backplane():
+    """Apply broadcasts and state changes published by other workers to this one"""
+    backplane.subscribe("ws", websockets.manager.deliver_remote)
+    backplane.subscribe("orders", orders.apply_remote_order_change)
+    backplane.subscribe("menu", lambda payload: menu_cache.invalidate())
+    backplane.subscribe("discounts", lambda payload: discount_engine.invalidate())
+    backplane.subscribe("users", lambda payload: principal_cache.invalidate_user(payload["username"]))
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and seed default menu on startup"""
@@ -91,7 +114,6 @@ async def startup_event():
         
         # Seed default admin user if none exists
         from models import User
-        from auth import hash_password
         user_result = await session.execute(select(func.count()).select_from(User))
         user_count = user_result.scalar_one()
         
@@ -99,7 +121,7 @@ async def startup_event():
             default_admin = User(
                 username="admin",
                 email="admin@delicacy.com",
-                hashed_password=hash_password("adminpassword"),
+                hashed_password=await password_hasher.hash("adminpassword"),
                 role="admin",
                 is_active=True
             )
@@ -113,33 +135,55 @@ async def startup_event():
             
             # Get or create default category
             cat_result = await session.execute(select(Category).where(Category.name == "default"))
-            default_cat = cat_result.scalar_one_or_none()
-            
-            if not default_cat:
-                default_cat = Category(name="default", display_order=0)
-                session.add(default_cat)
-                await session.commit()
-                await session.refresh(default_cat)
-            
-            for item_data in menu_items:
-                item_data_copy = item_data.copy()
-                cat_name = item_data_copy.pop("category", "default")
-                
-                # Create category if needed
-                cat_check = await session.execute(select(Category).where(Category.name == cat_name))
-                cat = cat_check.scalar_one_or_none()
-                
-                if not cat:
-                    cat = Category(name=cat_name)
-                    session.add(cat)
-                    await session.commit()
-                    await session.refresh(cat)
-                
-                item_data_copy["category_id"] = cat.id
-                session.add(MenuItem(**item_data_copy))
+            if not cat_result.scalar_one_or_none():
+                session.add(Category(name="default", display_order=0))
             
+            # Categories and items are written in one batched transaction
+            await upsert_menu(session, menu_items)
             await session.commit()
             print(f"Auto-seeded {len(menu_items)} menu items on first startup!")
+        
+        # Reports aggregate over order_items; flag orders that predate it
+        missing_items = await count_orders_missing_items(session)
+        if missing_items:
+            print(f"Warning: {missing_items} orders have no order_items rows - run 'python order_items.py' to backfill")
+        
+        # Drop expired Idempotency-Key replays
+        await idempotency_store.purge_expired()
+        
+        # Give the menu a baseline revision so delta-sync clients have something to start from
+        if await get_menu_revision(session) == 0:
+            await record_menu_change(session, "menu", "reset")
+            await session.commit()
+        
+        # Follow other workers' changes from before the in-memory state below is loaded
+        subscribe_backplane()
+        await backplane.start()
+        
+        # Load open orders for the kitchen display and queue them for ETA estimates
+        kitchen_eta.use_menu(await menu_cache.get_snapshot(session))
+        await kitchen_board.load(session)
+        
+        # Dashboard counters are maintained incrementally from here on
+        await order_counters.rebuild(session)
+        
+        # Old processed webhook events are only kept for auditing
+        await payment_event_worker.purge_processed()
+    
+    # Apply queued payment webhooks and reconcile stuck payments in the background
+    payment_event_worker.start(
+        on_paid=orders.announce_payment,
+        on_failed=orders.announce_payment_failed
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued orders and release gateway connections and worker threads before the worker exits"""
+    await order_ingest.close()
+    await payment_event_worker.close()
+    await backplane.close()
+    payment_gateway.close()
+    password_hasher.close()
 
 if __name__ == "__main__":
     import uvicorn
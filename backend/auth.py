@@ -1,14 +1,21 @@
 import os
+import asyncio
+import time
 import jwt
 import bcrypt
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Deque, Dict, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlalchemy.future import select
 
 from database import get_db
+from backplane import backplane
 from models import User
 
 # JWT Settings
@@ -16,12 +23,22 @@ JWT_SECRET = os.getenv("JWT_SECRET", "super-secret-key-for-delicacy-restaurant")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 hours for staff/admin shift
 
+# Password hashing - raising BCRYPT_ROUNDS upgrades existing hashes as users log in
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_FAILURE_WINDOW_SECONDS = float(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", "300"))
+
+# Authenticated users are re-read from the database at least this often per token
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_SIZE = 1000
+
 security = HTTPBearer()
 
-def hash_password(password: str) -> str:
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
     """Hash a password using bcrypt"""
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds)
     hashed = bcrypt.hashpw(pwd_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -34,6 +51,136 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     except Exception:
         return False
 
+def needs_rehash(hashed_password: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    """True when a stored hash was made with a different bcrypt cost"""
+    try:
+        return int(hashed_password.split("$")[2]) != rounds
+    except (IndexError, ValueError):
+        return True
+
+# ===================== PASSWORD HASHER =====================
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool. bcrypt releases the GIL, so logins
+    no longer stall the event loop, and the pool size caps how many CPU cores a burst
+    of logins can take away from order traffic; extra logins wait their turn.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, rounds: int = BCRYPT_ROUNDS):
+        self.workers = max(1, workers)
+        self.rounds = rounds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dummy_hash: Optional[str] = None
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> bool:
+        """Check a password; unknown users are checked against a dummy hash so timing doesn't reveal them"""
+        if hashed_password is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await self.hash("dummy-password")
+            await self._run(verify_password, password, self._dummy_hash)
+            return False
+        return await self._run(verify_password, password, hashed_password)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_hasher = PasswordHasher()
+
+# ===================== LOGIN THROTTLE =====================
+
+class LoginThrottle:
+    """
+    Per-process sliding window of failed logins per username and per client IP.
+    Blocked attempts are refused before any bcrypt work is done. Attempts still being
+    verified count against the limit too, so a burst of concurrent guesses can't all
+    get through before the first failure is recorded. An IP gets several usernames'
+    worth of failures so staff sharing one restaurant network aren't locked out together.
+    """
+
+    def __init__(
+        self,
+        max_failures: int = LOGIN_MAX_FAILURES,
+        window_seconds: float = LOGIN_FAILURE_WINDOW_SECONDS,
+        ip_multiplier: int = 4
+    ):
+        self.max_failures = max(1, max_failures)
+        self.window_seconds = window_seconds
+        self.ip_multiplier = ip_multiplier
+        self._failures: Dict[str, Deque[float]] = {}
+        self._pending: Dict[str, int] = {}
+        self._last_prune = time.monotonic()
+
+    def _recent(self, key: str, now: float) -> Deque[float]:
+        failures = self._failures.get(key)
+        if failures is None:
+            return deque()
+        while failures and failures[0] <= now - self.window_seconds:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        return failures
+
+    def _keys(self, username: str, ip: Optional[str]):
+        yield f"user:{username.lower()}", self.max_failures
+        if ip:
+            yield f"ip:{ip}", self.max_failures * self.ip_multiplier
+
+    def acquire(self, username: str, ip: Optional[str]):
+        """
+        Reserve a login attempt, raising 429 if the username or IP has too many recent
+        failures plus attempts in flight. Every acquire must be paired with release().
+        """
+        now = time.monotonic()
+        keys = list(self._keys(username, ip))
+        for key, limit in keys:
+            failures = self._recent(key, now)
+            if len(failures) + self._pending.get(key, 0) >= limit:
+                # Only in-flight attempts: they'll be decided within a bcrypt round
+                retry_after = int(failures[0] + self.window_seconds - now) + 1 if failures else 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many failed login attempts, please try again later",
+                    headers={"Retry-After": str(retry_after)},
+                )
+        for key, _ in keys:
+            self._pending[key] = self._pending.get(key, 0) + 1
+
+    def release(self, username: str, ip: Optional[str]):
+        """Drop the reservation made by acquire(); record_failure() afterwards if it failed"""
+        for key, _ in self._keys(username, ip):
+            remaining = self._pending.get(key, 0) - 1
+            if remaining > 0:
+                self._pending[key] = remaining
+            else:
+                self._pending.pop(key, None)
+
+    def record_failure(self, username: str, ip: Optional[str]):
+        now = time.monotonic()
+        for key, _ in self._keys(username, ip):
+            self._failures.setdefault(key, deque()).append(now)
+        # Sweep keys nobody has retried, at most once per window
+        if now - self._last_prune >= self.window_seconds:
+            self._last_prune = now
+            for key in [key for key, failures in self._failures.items() if failures[-1] <= now - self.window_seconds]:
+                del self._failures[key]
+
+    def reset(self, username: str):
+        """Clear a username's failures after a successful login"""
+        self._failures.pop(f"user:{username.lower()}", None)
+
+login_throttle = LoginThrottle()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Generate a JWT token"""
     to_encode = data.copy()
@@ -53,12 +200,96 @@ def decode_access_token(token: str) -> Optional[dict]:
     except jwt.PyJWTError:
         return None
 
+# ===================== PRINCIPAL CACHE =====================
+
+class PrincipalCache:
+    """
+    Short-lived map of bearer token -> authenticated user, so kitchen screens polling
+    every few seconds don't decode the JWT and query the users table on each request.
+    Entries never outlive the token's own expiry, and any ORM change to a user
+    (deactivation, role change) drops that user's entries at flush and again once it
+    commits; changes made outside the ORM are picked up within PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS, max_entries: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        # Bumped on every invalidation; a put() for a row read before that is dropped
+        self.version = 0
+
+    def get(self, token: str) -> Optional[User]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires, user = entry
+        if expires < time.monotonic():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return user
+
+    def put(self, token: str, user: User, token_expires_at: Optional[float] = None, version: Optional[int] = None):
+        """
+        Cache a verified, active user; token_expires_at is the JWT exp (epoch seconds) and
+        version the cache version seen before the user was read.
+        """
+        if self.ttl_seconds <= 0 or (version is not None and version != self.version):
+            return
+        ttl = self.ttl_seconds
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        self._entries[token] = (time.monotonic() + ttl, user)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, username: str):
+        """Forget every cached token belonging to a user"""
+        self.version += 1
+        stale = [token for token, (_, user) in self._entries.items() if user.username == username]
+        for token in stale:
+            del self._entries[token]
+
+    def invalidate(self):
+        self.version += 1
+        self._entries.clear()
+
+principal_cache = PrincipalCache()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _forget_changed_user(mapper, connection, target: User):
+    # Covers renames too: the old username is in the attribute history
+    state = inspect(target)
+    history = state.attrs.username.history
+    usernames = {target.username, *(history.deleted or ())}
+    for username in usernames:
+        principal_cache.invalidate_user(username)
+    # Until commit other requests can still read the old row, so forget it again then
+    if state.session is not None:
+        state.session.info.setdefault("changed_users", set()).update(usernames)
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed_users(session: Session):
+    for username in session.info.pop("changed_users", ()):
+        principal_cache.invalidate_user(username)
+        backplane.publish("users", {"username": username})
+
+@event.listens_for(Session, "after_rollback")
+def _keep_rolled_back_users(session: Session):
+    session.info.pop("changed_users", None)
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
 ) -> User:
     """FastAPI dependency to secure endpoints with JWT authentication"""
     token = credentials.credentials
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+    
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(
@@ -74,6 +305,7 @@ async def get_current_user(
             detail="Token is missing identity subject",
         )
         
+    version = principal_cache.version
     result = await db.execute(select(User).where(User.username == username))
     user = result.scalar_one_or_none()
     if not user:
@@ -87,5 +319,8 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User account is inactive",
         )
-        
+    
+    # Detach so the cached instance isn't tied to this request's session
+    db.expunge(user)
+    principal_cache.put(token, user, payload.get("exp"), version)
     return user
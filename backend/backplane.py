@@ -0,0 +1,192 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, or_
+from sqlalchemy.future import select
+
+from database import async_session_maker, BACKPLANE, BACKPLANE_POLL_INTERVAL_MS
+from models import BackplaneMessage
+
+# Relayed messages only need to outlive the slowest worker's poll
+RETENTION = timedelta(seconds=60)
+MAX_MESSAGES_PER_POLL = 500
+# Unflushed publishes kept while the database is unreachable; the oldest are dropped past this
+MAX_OUTBOX = 10000
+# A skipped id may belong to a publisher that hasn't committed yet; look for it this long
+GAP_TIMEOUT_SECONDS = 5
+MAX_TRACKED_GAPS = 1000
+# How long close() lets an in-flight flush/poll finish before cancelling it
+CLOSE_TIMEOUT_SECONDS = 5
+
+# ===================== BACKPLANE =====================
+
+class LocalBackplane:
+    """
+    Pub/sub between API workers. Publishers always apply a change to their own worker
+    first and then publish it; the backplane only carries it to the *other* workers,
+    whose subscribers apply it to their own sockets and caches.
+
+    This implementation is for a single worker: there is nobody else to tell.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Callable[[Dict], None]]] = {}
+
+    def subscribe(self, topic: str, handler: Callable[[Dict], None]):
+        """Call handler(payload) for messages on topic published by other workers"""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, payload: Dict):
+        """Send a JSON-serializable payload to the other workers without waiting"""
+
+    def dispatch(self, topic: str, payload: Dict):
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"Backplane handler for {topic} failed: {e}")
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+class DatabaseBackplane(LocalBackplane):
+    """
+    Relays messages through the backplane_messages table, so workers and containers
+    sharing the database need no extra service. Publishes are buffered and written in
+    one transaction per poll; each worker reads rows after the last id it has seen and
+    skips its own. SQLite's single writer commits ids in order. Databases with concurrent
+    writers (e.g. PostgreSQL) can commit a lower id after a higher one, so ids skipped
+    over are re-checked for GAP_TIMEOUT_SECONDS and delivered late if they show up.
+    """
+
+    def __init__(self, poll_interval: float = BACKPLANE_POLL_INTERVAL_MS / 1000):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self._outbox: List[Tuple[str, Dict]] = []
+        self._last_id = 0
+        self._gaps: Dict[int, float] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def publish(self, topic: str, payload: Dict):
+        self._outbox.append((topic, payload))
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self):
+        async with async_session_maker() as session:
+            result = await session.execute(select(func.max(BackplaneMessage.id)))
+            self._last_id = result.scalar_one() or 0
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_purge = loop.time()
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._flush()
+                await self._poll()
+                if loop.time() - last_purge >= RETENTION.total_seconds() / 2:
+                    last_purge = loop.time()
+                    await self._purge()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Backplane error: {e}")
+
+    async def _flush(self):
+        if not self._outbox:
+            return
+        outbox, self._outbox = self._outbox, []
+        now = datetime.utcnow()
+        try:
+            async with async_session_maker() as session:
+                await session.execute(insert(BackplaneMessage), [
+                    {"origin": self.origin, "topic": topic, "payload": payload, "created_at": now}
+                    for topic, payload in outbox
+                ])
+                await session.commit()
+        except BaseException:
+            # Keep the messages (ahead of anything published since) for the next flush
+            self._outbox[:0] = outbox
+            if len(self._outbox) > MAX_OUTBOX:
+                print(f"Backplane outbox full, dropping {len(self._outbox) - MAX_OUTBOX} oldest messages")
+                del self._outbox[:len(self._outbox) - MAX_OUTBOX]
+            raise
+
+    async def _poll(self):
+        now = asyncio.get_running_loop().time()
+        self._gaps = {gap: deadline for gap, deadline in self._gaps.items() if deadline > now}
+        condition = BackplaneMessage.id > self._last_id
+        if self._gaps:
+            condition = or_(condition, BackplaneMessage.id.in_(self._gaps))
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(BackplaneMessage.id, BackplaneMessage.origin, BackplaneMessage.topic, BackplaneMessage.payload)
+                .where(condition)
+                .order_by(BackplaneMessage.id)
+                .limit(MAX_MESSAGES_PER_POLL)
+            )
+            rows = result.all()
+        for message_id, origin, topic, payload in rows:
+            if message_id <= self._last_id:
+                # A late commit filling a gap
+                self._gaps.pop(message_id, None)
+            else:
+                for gap in range(max(self._last_id + 1, message_id - MAX_TRACKED_GAPS), message_id):
+                    self._gaps[gap] = now + GAP_TIMEOUT_SECONDS
+                self._last_id = message_id
+            if origin != self.origin:
+                self.dispatch(topic, payload or {})
+        if len(rows) == MAX_MESSAGES_PER_POLL:
+            # More waiting - don't sleep before the next read
+            self._wake.set()
+
+    async def _purge(self):
+        async with async_session_maker() as session:
+            # Always keep the newest row: SQLite reuses ids once the table is empty,
+            # which would put new messages below every worker's last seen id
+            newest = select(func.max(BackplaneMessage.id)).scalar_subquery()
+            await session.execute(
+                delete(BackplaneMessage).where(
+                    BackplaneMessage.created_at < datetime.utcnow() - RETENTION,
+                    BackplaneMessage.id < newest
+                )
+            )
+            await session.commit()
+
+    async def close(self):
+        if self._task is not None:
+            # Stop between iterations: cancelling mid-query can leave its connection
+            # holding a database lock that stalls every other writer
+            self._closing = True
+            self._wake.set()
+            try:
+                await asyncio.wait_for(self._task, timeout=CLOSE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._task = None
+        # Deliver whatever was published during shutdown
+        await self._flush()
+
+def create_backplane(kind: str = BACKPLANE) -> LocalBackplane:
+    if kind == "database":
+        return DatabaseBackplane()
+    if kind != "local":
+        raise ValueError(f"Unknown BACKPLANE '{kind}' (expected 'local' or 'database')")
+    return LocalBackplane()
+
+backplane = create_backplane()
@@ -0,0 +1,816 @@
+"""
+Load and concurrency checks for the hot paths, run against a scratch SQLite database
+(never DATABASE_URL):
+
+    python benchmarks.py pagination [orders]
+    python benchmarks.py order_numbers [workers] [per_worker]
+    python benchmarks.py discount_redemption [orders] [usage_limit]
+    python benchmarks.py order_ingest [orders] [concurrency]
+    python benchmarks.py ws_fanout [sockets] [stalled] [broadcasts]
+    python benchmarks.py login_storm [staff] [probes]
+    python benchmarks.py payment_gateway [orders]
+    python benchmarks.py backplane [messages] [publishers]
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# ===================== FAKE RAZORPAY =====================
+
+class FakeGatewayHandler(BaseHTTPRequestHandler):
+    """
+    The slice of the Razorpay REST API the app uses. server.mode is "ok", "slow"
+    (answers after server.delay seconds) or "down" (HTTP 500).
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: dict):
+        encoded = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _degraded(self) -> bool:
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        if server.mode == "slow":
+            time.sleep(server.delay)
+        if server.mode == "down":
+            self._reply(500, {"error": {"code": "SERVER_ERROR", "description": "Gateway down"}})
+            return True
+        return False
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self._degraded():
+            return
+        if urlparse(self.path).path != "/v1/orders":
+            return self._reply(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "Not found"}})
+        with self.server.lock:
+            order_id = f"order_bench{len(self.server.orders) + 1:06d}"
+            order = {"id": order_id, "amount": data["amount"], "currency": data["currency"], "status": "created"}
+            self.server.orders[order_id] = order
+        self._reply(200, order)
+
+    def do_GET(self):
+        if self._degraded():
+            return
+        url = urlparse(self.path)
+        if url.path != "/v1/payments":
+            return self._reply(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "Not found"}})
+        query = {key: int(values[0]) for key, values in parse_qs(url.query).items() if values[0].isdigit()}
+        skip, count = query.get("skip", 0), query.get("count", 10)
+        with self.server.lock:
+            items = self.server.payments[skip:skip + count]
+        self._reply(200, {"entity": "collection", "count": len(items), "items": items})
+
+class FakeGateway(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeGatewayHandler)
+        self.lock = threading.Lock()
+        self.mode = "ok"
+        self.delay = 0.0
+        self.requests = 0
+        self.orders = {}
+        self.payments = []
+
+    def handle_error(self, request, client_address):
+        # The app hung up on a slow answer after its timeout - expected here
+        pass
+
+FAKE_GATEWAY = FakeGateway()
+WEBHOOK_SECRET = "bench-webhook-secret"
+
+# Point the app at a throwaway database and the fake gateway before anything imports database.py
+BENCHMARK_DB = os.path.join(tempfile.mkdtemp(prefix="delicacy-bench-"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{BENCHMARK_DB}"
+os.environ["RAZORPAY_BASE_URL"] = f"http://127.0.0.1:{FAKE_GATEWAY.server_port}"
+os.environ["RAZORPAY_WEBHOOK_SECRET"] = WEBHOOK_SECRET
+os.environ["PAYMENT_GATEWAY_TIMEOUT_SECONDS"] = "0.5"
+os.environ["PAYMENT_BREAKER_FAILURES"] = "3"
+os.environ["PAYMENT_BREAKER_RESET_SECONDS"] = "1"
+
+from fastapi import Response
+from sqlalchemy import func, insert, update
+from sqlalchemy.future import select
+
+from database import async_session_maker, create_tables, engine
+from models import BackplaneMessage, Discount, MenuItem, Order, User
+
+SEED_STATUSES = ["pending", "preparing", "ready", "completed"]
+SEED_PAYMENT_STATUSES = ["pending", "paid"]
+
+async def seed_orders(count: int, batch_size: int = 5000):
+    """Bulk insert count orders, one per second going back from now, spread over statuses and tables"""
+    start = datetime.utcnow() - timedelta(seconds=count)
+    async with async_session_maker() as session:
+        for first in range(0, count, batch_size):
+            await session.execute(insert(Order), [
+                {
+                    "order_number": f"BENCH{n:010d}",
+                    "table_number": n % 20 + 1,
+                    "customer_name": "Bench",
+                    "customer_phone": "9876543210",
+                    "items_json": [],
+                    "subtotal": 100.0,
+                    "tax_amount": 5.0,
+                    "total_amount": 105.0,
+                    "status": SEED_STATUSES[n % len(SEED_STATUSES)],
+                    "payment_status": SEED_PAYMENT_STATUSES[n % 3 % len(SEED_PAYMENT_STATUSES)],
+                    "created_at": start + timedelta(seconds=n)
+                }
+                for n in range(first, min(first + batch_size, count))
+            ])
+            await session.commit()
+
+def latency_summary(samples_ms) -> str:
+    """p50/p99/max of latencies in milliseconds"""
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return "no samples"
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50 {ordered[len(ordered) // 2]:7.2f} ms  p99 {p99:7.2f} ms  max {ordered[-1]:7.2f} ms"
+
+@asynccontextmanager
+async def running_app():
+    """The full app (startup seeding, order ingest worker, ...) behind an in-process HTTP client"""
+    import httpx
+    from app import app, shutdown_event, startup_event
+
+    await startup_event()
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=60) as client:
+            yield client
+    finally:
+        await shutdown_event()
+
+async def order_payload(table_number: int = 1, **fields) -> dict:
+    """A one-item order for the first seeded menu item"""
+    async with async_session_maker() as session:
+        item = (await session.execute(select(MenuItem).order_by(MenuItem.id).limit(1))).scalar_one()
+    return {
+        "table_number": table_number,
+        "customer_name": "Bench",
+        "customer_phone": "9876543210",
+        "items": [{"menu_item_id": item.id, "name": item.name, "price": item.price, "quantity": 1}],
+        "subtotal": 0,
+        "tax_amount": 0,
+        "total_amount": 0,
+        **fields
+    }
+
+# ===================== ORDER LIST PAGINATION =====================
+
+async def bench_pagination(count: int = 1_000_000, page_size: int = 50):
+    """
+    Time deep pages of GET /api/orders with offset (before) and keyset cursor (after),
+    unfiltered and with each filter the admin order page uses, and check that every
+    cursor page is served from an index without sorting.
+    """
+    from sqlalchemy import event
+    from routes.orders import encode_order_cursor, get_orders
+
+    started = time.perf_counter()
+    await seed_orders(count)
+    print(f"Seeded {count} orders in {time.perf_counter() - started:.0f} s")
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    filters = [{}, {"status": "completed"}, {"payment_status": "pending"}, {"table_number": 7}]
+    async with async_session_maker() as session:
+        async def page(params, **paging):
+            response = Response()
+            started = time.perf_counter()
+            rows = await get_orders(
+                response, status=params.get("status"), payment_status=params.get("payment_status"),
+                table_number=params.get("table_number"), search=None, limit=page_size,
+                offset=paging.get("offset", 0), cursor=paging.get("cursor"), db=session
+            )
+            return rows, time.perf_counter() - started
+
+        for params in filters:
+            query = select(func.count()).select_from(Order)
+            for field, value in params.items():
+                query = query.where(getattr(Order, field) == value)
+            matching = (await session.execute(query)).scalar_one()
+            print(f"{params or 'no filter'}: {matching} orders")
+            for depth in (0, matching // 10, matching // 2, matching - page_size):
+                offset_rows, offset_time = await page(params, offset=depth)
+                # Start the cursor one page earlier so both fetch the same rows
+                if depth:
+                    previous_rows, _ = await page(params, offset=depth - page_size)
+                    cursor = encode_order_cursor(previous_rows[-1])
+                else:
+                    cursor = None
+                event.listen(engine.sync_engine, "before_cursor_execute", capture)
+                try:
+                    cursor_rows, cursor_time = await page(params, cursor=cursor)
+                finally:
+                    event.remove(engine.sync_engine, "before_cursor_execute", capture)
+                assert [o.id for o in cursor_rows] == [o.id for o in offset_rows], "cursor and offset pages differ"
+                print(
+                    f"  depth {depth:>8}: offset {offset_time * 1000:7.1f} ms   "
+                    f"cursor {cursor_time * 1000:7.1f} ms"
+                )
+
+            # Plan of the deepest cursor page, exactly as get_orders issued it
+            statement, parameters = statements[-1]
+            connection = await session.connection()
+            plan = [row[-1] for row in (await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()]
+            statements.clear()
+            print(f"  plan: {'; '.join(plan)}")
+            assert any("USING INDEX ix_orders_" in step for step in plan), "cursor page is not using an order index"
+            assert not any("TEMP B-TREE" in step for step in plan), "cursor page sorts instead of walking the index"
+
+# ===================== ORDER NUMBER UNIQUENESS =====================
+
+def _generate_order_numbers(count: int):
+    from concurrent.futures import ThreadPoolExecutor
+    from order_numbers import order_numbers
+
+    # Several threads per worker, like the request handlers sharing one generator
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        chunks = pool.map(lambda _: [order_numbers.next_order_number() for _ in range(count // 4)], range(4))
+        return order_numbers.node_id, [number for chunk in chunks for number in chunk]
+
+async def bench_order_numbers(workers: int = 8, per_worker: int = 200_000):
+    """
+    Generate order numbers flat out in several forked workers, each from four threads,
+    and check that none repeat: first with every worker sharing one ORDER_NODE_ID, as
+    with 'uvicorn --workers N' in one container, then with node ids from lock-file slots alone.
+    """
+    import multiprocessing
+
+    host_id = os.getenv("ORDER_NODE_ID") or "3"
+    for label, node_env in ((f"ORDER_NODE_ID={host_id}", host_id), ("ORDER_NODE_ID unset", None)):
+        if node_env is None:
+            os.environ.pop("ORDER_NODE_ID", None)
+        else:
+            os.environ["ORDER_NODE_ID"] = node_env
+        started = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            results = pool.map(_generate_order_numbers, [per_worker] * workers)
+        elapsed = time.perf_counter() - started
+        node_ids = {node_id for node_id, _ in results}
+        numbers = [number for _, batch in results for number in batch]
+        duplicates = len(numbers) - len(set(numbers))
+        print(f"{label}: {len(numbers)} numbers from {workers} workers (node ids {sorted(node_ids)}) "
+              f"in {elapsed:.1f} s, duplicates {duplicates}")
+        assert len(node_ids) == workers and not duplicates, "order numbers collided"
+
+# ===================== DISCOUNT REDEMPTION =====================
+
+async def bench_discount_redemption(orders: int = 500, usage_limit: int = 50):
+    """
+    Place orders simultaneously with one limited-use discount code and check it is
+    never redeemed more than usage_limit times; then check that validation sees the
+    exhausted limit, validity windows and newly created or deleted codes straight away.
+    """
+    async with running_app() as client:
+        async with async_session_maker() as session:
+            session.add(Discount(
+                code="BENCH", name="Bench", discount_type="fixed",
+                discount_value=10, usage_limit=usage_limit
+            ))
+            await session.commit()
+        payload = await order_payload(discount_code="BENCH")
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/api/orders", json={**payload, "table_number": n % 20 + 1})
+            for n in range(orders)
+        ])
+        elapsed = time.perf_counter() - started
+
+        async with async_session_maker() as session:
+            usage_count = (await session.execute(
+                select(Discount.usage_count).where(Discount.code == "BENCH")
+            )).scalar_one()
+            discounted = (await session.execute(
+                select(func.count()).select_from(Order).where(Order.discount_code == "BENCH")
+            )).scalar_one()
+
+        print(f"{orders} orders in {elapsed:.1f} s, responses {dict(Counter(r.status_code for r in responses))}")
+        print(f"usage limit {usage_limit}: usage_count {usage_count}, discounted orders {discounted}")
+        assert usage_count <= usage_limit and discounted == usage_count, "discount over-redeemed"
+
+        # Validation reads the cached codes: create/delete must invalidate it, and the
+        # validity window must hold for codes still under their limit
+        login = await client.post("/api/admin/login", json={"username": "admin", "password": "adminpassword"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        now = datetime.utcnow()
+        windows = {
+            "BENCHEXPIRED": {"valid_until": (now - timedelta(days=1)).isoformat()},
+            "BENCHLATER": {"valid_from": (now + timedelta(days=1)).isoformat()},
+            "BENCHOPEN": {}
+        }
+        created = {}
+        for code, window in windows.items():
+            response = await client.post("/api/discounts", headers=headers, json={
+                "code": code, "name": code, "discount_type": "fixed", "discount_value": 10, **window
+            })
+            assert response.status_code == 200, response.text
+            created[code] = response.json()["id"]
+
+        async def validate(code: str):
+            response = await client.post("/api/discounts/validate", params={"code": code, "order_amount": 500})
+            return response.status_code, response.json().get("detail", "valid")
+
+        checks = {code: await validate(code) for code in ["BENCH", *windows]}
+        expired_orders = await asyncio.gather(*[
+            client.post("/api/orders", json={**payload, "discount_code": "BENCHEXPIRED", "table_number": n + 1})
+            for n in range(20)
+        ])
+        await client.delete(f"/api/discounts/{created['BENCHOPEN']}", headers=headers)
+        checks["BENCHOPEN deleted"] = await validate("BENCHOPEN")
+        async with async_session_maker() as session:
+            expired_usage = (await session.execute(
+                select(Discount.usage_count).where(Discount.code == "BENCHEXPIRED")
+            )).scalar_one()
+            expired_discounted = (await session.execute(
+                select(func.count()).select_from(Order).where(Order.discount_code == "BENCHEXPIRED")
+            )).scalar_one()
+
+    for label, (status, detail) in checks.items():
+        print(f"validate {label:<18} {status} {detail}")
+    placed = sum(1 for response in expired_orders if response.status_code == 200)
+    print(f"20 orders with BENCHEXPIRED: {placed} placed, discount applied to {expired_discounted}, usage_count {expired_usage}")
+    assert checks == {
+        "BENCH": (400, "Discount code usage limit reached"),
+        "BENCHEXPIRED": (400, "Discount code has expired"),
+        "BENCHLATER": (400, "Discount code is not active yet"),
+        "BENCHOPEN": (200, "valid"),
+        "BENCHOPEN deleted": (404, "Invalid or expired discount code")
+    }, "discount validation disagrees with the code's limit, window or deletion"
+    assert placed == 20 and not expired_discounted and not expired_usage, "expired code was redeemed"
+
+# ===================== ORDER WRITE THROUGHPUT =====================
+
+async def bench_order_ingest(orders: int = 3000, concurrency: int = 100):
+    """
+    POST /api/orders from concurrency checkouts at once, first with one commit per order
+    (ORDER_BATCH_MAX_SIZE=1) and then with group commit. Reports throughput, request
+    latency and the time spent in order_ingest.submit() itself.
+    """
+    from order_ingest import order_ingest
+
+    async with running_app() as client:
+        payload = await order_payload()
+        submit, write = order_ingest.submit, order_ingest._write
+        group_batch_size = order_ingest.max_batch_size
+
+        for label, batch_size in (("per-order commit", 1), ("group commit", group_batch_size)):
+            order_ingest.max_batch_size = batch_size
+            submit_ms, request_ms, batch_sizes = [], [], []
+
+            async def timed_submit(order, discount_id=None):
+                started = time.perf_counter()
+                try:
+                    return await submit(order, discount_id)
+                finally:
+                    submit_ms.append((time.perf_counter() - started) * 1000)
+
+            async def counted_write(batch):
+                batch_sizes.append(len(batch))
+                await write(batch)
+
+            order_ingest.submit, order_ingest._write = timed_submit, counted_write
+            numbers = iter(range(orders))
+
+            async def checkout():
+                for n in numbers:
+                    started = time.perf_counter()
+                    response = await client.post("/api/orders", json={**payload, "table_number": n % 20 + 1})
+                    assert response.status_code == 200, response.text
+                    request_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*[checkout() for _ in range(concurrency)])
+            elapsed = time.perf_counter() - started
+            del order_ingest.submit, order_ingest._write
+
+            print(f"{label}: {orders / elapsed:6.0f} orders/s, {len(batch_sizes)} transactions "
+                  f"(avg {sum(batch_sizes) / len(batch_sizes):.1f} orders)")
+            print(f"  request  {latency_summary(request_ms)}")
+            print(f"  submit() {latency_summary(submit_ms)}")
+        order_ingest.max_batch_size = group_batch_size
+
+# ===================== WEBSOCKET FAN-OUT =====================
+
+class FakeSocket:
+    """Stands in for a starlette WebSocket; a stalled one never finishes a send"""
+
+    def __init__(self, sent_at: dict, stalled: bool = False):
+        self.sent_at = sent_at
+        self.stalled = stalled
+        self.latencies_ms = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, frame: str):
+        if self.stalled:
+            await asyncio.Event().wait()
+        await asyncio.sleep(0)
+        self.latencies_ms.append((time.perf_counter() - self.sent_at[frame]) * 1000)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+async def _ws_fanout_round(sockets: int, stalled: int, broadcasts: int):
+    from routes.websockets import ConnectionManager, encode_message, RESYNC_FRAME
+
+    manager = ConnectionManager()
+    sent_at = {}
+    fakes = [FakeSocket(sent_at, stalled=n < stalled) for n in range(sockets)]
+    for n, fake in enumerate(fakes):
+        await manager.connect(fake, "kitchen" if n % 2 else "admin")
+    clients = {fake: manager.clients[fake] for fake in fakes}
+
+    broadcast_ms = []
+    for n in range(broadcasts):
+        message = {"type": "new_order", "order": {"id": n, "items": [{"name": "Paneer Tikka", "quantity": 2}]}}
+        started = time.perf_counter()
+        sent_at[encode_message(message)] = started
+        await manager.broadcast_all(message)
+        broadcast_ms.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.002)
+    await asyncio.sleep(0.2)
+
+    healthy = fakes[stalled:]
+    incomplete = sum(1 for fake in healthy if len(fake.latencies_ms) != broadcasts)
+    resynced_then_closed = sum(
+        1 for fake in fakes[:stalled]
+        if clients[fake].closed and fake.close_code == 1013
+        and not clients[fake].queue.empty() and clients[fake].queue.get_nowait() is RESYNC_FRAME
+    )
+    for n, fake in enumerate(fakes):
+        manager.disconnect(fake, "kitchen" if n % 2 else "admin")
+    print(f"{sockets} sockets, {stalled:>3} stalled:")
+    print(f"  broadcast call        {latency_summary(broadcast_ms)}")
+    print(f"  delivery to healthy   {latency_summary([ms for fake in healthy for ms in fake.latencies_ms])}")
+    print(f"  healthy missing frames {incomplete}, stalled resync + 1013 {resynced_then_closed}/{stalled}")
+    return incomplete, resynced_then_closed
+
+async def bench_ws_fanout(sockets: int = 500, stalled: int = 25, broadcasts: int = 300):
+    """
+    Broadcast to kitchen/admin screens through ConnectionManager, first with every screen
+    healthy and then with some stalled. Healthy screens must get every frame just as
+    promptly; stalled ones get their backlog replaced by a resync and are closed with 1013.
+    """
+    from routes.websockets import WS_SEND_QUEUE_SIZE
+
+    print(f"{broadcasts} broadcasts, send queue {WS_SEND_QUEUE_SIZE}")
+    await _ws_fanout_round(sockets, 0, broadcasts)
+    incomplete, resynced_then_closed = await _ws_fanout_round(sockets, stalled, broadcasts)
+    assert not incomplete, "a healthy client missed frames"
+    # A stalled client is only dropped after overflowing its queue twice
+    if broadcasts > 2 * WS_SEND_QUEUE_SIZE:
+        assert resynced_then_closed == stalled, "a stalled client was not resynced and closed"
+
+# ===================== LOGIN STORM =====================
+
+async def bench_login_storm(staff: int = 16, probes: int = 200):
+    """
+    Order create and lookup latency while staff accounts log in back to back, compared
+    with the same probes on a quiet server and with bcrypt run inline on the event loop
+    (as before PasswordHasher). On the executor, order traffic only competes with bcrypt
+    for CPU cores, so the gap to quiet shrinks as cores are added.
+    """
+    from auth import password_hasher
+
+    async with running_app() as client:
+        # One real hash shared by every bench account; each login still pays a full bcrypt check
+        hashed = await password_hasher.hash("benchpassword")
+        async with async_session_maker() as session:
+            session.add_all([
+                User(username=f"bench{n}", email=f"bench{n}@delicacy.com", hashed_password=hashed, role="staff")
+                for n in range(staff)
+            ])
+            await session.commit()
+        payload = await order_payload()
+
+        async def probe(count: int = probes):
+            samples = []
+            for n in range(count):
+                started = time.perf_counter()
+                response = await client.post("/api/orders", json={**payload, "table_number": n % 20 + 1})
+                assert response.status_code == 200, response.text
+                await client.get(f"/api/orders/number/{response.json()['order_number']}")
+                samples.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.005)
+            return samples
+
+        stop = asyncio.Event()
+        logins = Counter()
+
+        async def log_in_repeatedly(username: str):
+            # One login at a time per account, so the throttle's in-flight limit never trips
+            while not stop.is_set():
+                response = await client.post("/api/admin/login", json={"username": username, "password": "benchpassword"})
+                logins[response.status_code] += 1
+
+        async def under_storm(count: int = probes):
+            stop.clear()
+            logins.clear()
+            storm = [asyncio.create_task(log_in_repeatedly(f"bench{n}")) for n in range(staff)]
+            started = time.perf_counter()
+            samples = await probe(count)
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await asyncio.gather(*storm)
+            return samples, f"{sum(logins.values())} logins in {elapsed:.1f} s {dict(logins)}"
+
+        async def run_inline(func, *args):
+            return func(*args)
+
+        quiet = await probe()
+        executor, executor_logins = await under_storm()
+        password_hasher._run = run_inline
+        try:
+            # Every probe now queues behind whole bcrypt checks; a few make the point
+            inline, inline_logins = await under_storm(min(probes, 5))
+        finally:
+            del password_hasher._run
+
+    print(f"order create + lookup, {probes} probes, {os.cpu_count()} CPUs, {password_hasher.workers} hash workers")
+    print(f"  quiet:                 {latency_summary(quiet)}")
+    print(f"  storm, hash executor:  {latency_summary(executor)}   ({executor_logins})")
+    print(f"  storm, inline bcrypt:  {latency_summary(inline)}   ({len(inline)} probes, {inline_logins})")
+
+# ===================== PAYMENT GATEWAY =====================
+
+async def bench_payment_gateway(orders: int = 200):
+    """
+    Drive the Razorpay path against the fake gateway: healthy calls, timeouts tripping
+    the circuit breaker, fail-fast 503s while open, a single half-open trial, and then
+    webhook and reconciliation events applied by the payment event worker in batches.
+    """
+    from payment_events import payment_event_worker, RECONCILE_GRACE
+    from payment_gateway import payment_gateway
+    from order_stats import order_counters
+
+    threading.Thread(target=FAKE_GATEWAY.serve_forever, daemon=True).start()
+    breaker = payment_gateway.breaker
+    try:
+        async with running_app() as client:
+            payload = await order_payload()
+
+            async def place_order() -> int:
+                response = await client.post("/api/orders", json=payload)
+                return response.json()["order_id"]
+
+            async def open_payment(order_id: int):
+                started = time.perf_counter()
+                response = await client.post("/api/payment/create-order", json={"order_id": order_id})
+                return response, (time.perf_counter() - started) * 1000
+
+            order_ids = [await place_order() for _ in range(orders)]
+
+            # Healthy gateway
+            results = await asyncio.gather(*[open_payment(order_id) for order_id in order_ids])
+            assert all(response.status_code == 200 for response, _ in results)
+            gateway_orders = [response.json()["order_id"] for response, _ in results]
+            print(f"healthy: {orders} create-order calls  {latency_summary([ms for _, ms in results])}")
+
+            # Slow gateway: timeouts until the breaker opens, then immediate 503s
+            FAKE_GATEWAY.mode, FAKE_GATEWAY.delay = "slow", 2.0
+            spare = [await place_order() for _ in range(10)]
+            requests_before = FAKE_GATEWAY.requests
+            results = [await open_payment(order_id) for order_id in spare]
+            statuses = Counter(response.status_code for response, _ in results)
+            timed_out = [ms for _, ms in results[:breaker.max_failures]]
+            fail_fast = [ms for _, ms in results[breaker.max_failures:]]
+            print(f"slow:    {dict(statuses)}, {FAKE_GATEWAY.requests - requests_before} reached the gateway, breaker {breaker.state}")
+            print(f"  timed out  {latency_summary(timed_out)}")
+            print(f"  fail fast  {latency_summary(fail_fast)}")
+            assert statuses == {503: len(spare)} and breaker.state == "open"
+            assert FAKE_GATEWAY.requests - requests_before == breaker.max_failures
+
+            # Recovered (if sluggish) gateway: one half-open trial; calls arriving while it is
+            # in flight still fail fast, and the trial's success closes the breaker
+            FAKE_GATEWAY.delay = 0.3
+            await asyncio.sleep(breaker.reset_seconds)
+            requests_before = FAKE_GATEWAY.requests
+            results = await asyncio.gather(*[open_payment(order_id) for order_id in spare])
+            statuses = Counter(response.status_code for response, _ in results)
+            print(f"half-open burst: {dict(statuses)}, {FAKE_GATEWAY.requests - requests_before} reached the gateway, breaker {breaker.state}")
+            assert FAKE_GATEWAY.requests - requests_before == 1 and statuses[200] == 1
+            assert breaker.state == "closed"
+            FAKE_GATEWAY.mode = "ok"
+            assert (await open_payment(spare[0]))[0].status_code == 200
+
+            # Webhooks: captured + order.paid for every payment, some redelivered, some for unknown orders
+            batches = []
+            process_batch = payment_event_worker.process_batch
+
+            async def counted_batch():
+                read, settled = await process_batch()
+                if read:
+                    batches.append((read, settled))
+                return read, settled
+            payment_event_worker.process_batch = counted_batch
+
+            async def deliver(event_id: str, event: dict):
+                body = json.dumps(event)
+                signature = hmac.new(WEBHOOK_SECRET.encode(), body.encode(), hashlib.sha256).hexdigest()
+                return await client.post("/api/payment/webhook", content=body, headers={
+                    "X-Razorpay-Signature": signature, "X-Razorpay-Event-Id": event_id
+                })
+
+            webhook_orders = gateway_orders[:orders // 2]
+            deliveries = []
+            for n, gateway_order in enumerate(webhook_orders):
+                payment = {"id": f"pay_bench{n:06d}", "order_id": gateway_order, "status": "captured"}
+                deliveries.append((f"evt_captured_{n}", {"event": "payment.captured", "payload": {"payment": {"entity": payment}}}))
+                deliveries.append((f"evt_paid_{n}", {"event": "order.paid", "payload": {"payment": {"entity": payment}}}))
+                if n % 10 == 0:
+                    deliveries.append(deliveries[-1])
+            for n in range(5):
+                payment = {"id": f"pay_orphan{n}", "order_id": f"order_unknown{n}", "status": "captured"}
+                deliveries.append((f"evt_orphan_{n}", {"event": "payment.captured", "payload": {"payment": {"entity": payment}}}))
+            started = time.perf_counter()
+            responses = await asyncio.gather(*[deliver(event_id, event) for event_id, event in deliveries])
+            acked = time.perf_counter() - started
+            while True:
+                async with async_session_maker() as session:
+                    paid = (await session.execute(
+                        select(func.count()).select_from(Order).where(Order.payment_status == "paid")
+                    )).scalar_one()
+                if paid >= len(webhook_orders) or time.perf_counter() - started > 30:
+                    break
+                await asyncio.sleep(0.05)
+            applied = time.perf_counter() - started
+            print(
+                f"webhooks: {len(deliveries)} deliveries {dict(Counter(r.json()['status'] for r in responses))} "
+                f"acked in {acked:.2f} s, {paid} orders paid after {applied:.2f} s "
+                f"in {len(batches)} batches {[read for read, _ in batches]}"
+            )
+            assert paid == len(webhook_orders), "webhook payments were not all applied"
+
+            # Reconciliation: payments captured at the gateway whose webhooks never arrived
+            missed = gateway_orders[orders // 2:]
+            with FAKE_GATEWAY.lock:
+                FAKE_GATEWAY.payments = [
+                    {"id": f"pay_missed{n:06d}", "order_id": gateway_order, "status": "captured"}
+                    for n, gateway_order in enumerate(missed)
+                ]
+            async with async_session_maker() as session:
+                await session.execute(
+                    update(Order).where(Order.razorpay_order_id.in_(missed))
+                    .values(created_at=datetime.utcnow() - RECONCILE_GRACE - timedelta(minutes=1))
+                )
+                await session.commit()
+            started = time.perf_counter()
+            queued = await payment_event_worker.reconcile()
+            while True:
+                read, _ = await payment_event_worker.process_batch()
+                if not read:
+                    break
+            async with async_session_maker() as session:
+                paid = (await session.execute(
+                    select(func.count()).select_from(Order).where(Order.payment_status == "paid")
+                )).scalar_one()
+            print(f"reconcile: {queued} missed payments queued and {paid - len(webhook_orders)} applied in {time.perf_counter() - started:.2f} s")
+            assert paid == orders, "reconciliation missed captured payments"
+            assert order_counters.all_time.by_payment["paid"] == paid, "live payment counters drifted"
+            del payment_event_worker.process_batch
+    finally:
+        FAKE_GATEWAY.shutdown()
+
+# ===================== BACKPLANE RELAY =====================
+
+async def _wait_until(condition, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    return condition()
+
+async def _insert_backplane_row(message_id: int, seq: str):
+    """Write a relay row with an explicit id, as a late committer on another worker would"""
+    async with async_session_maker() as session:
+        await session.execute(insert(BackplaneMessage).values(
+            id=message_id, origin="late-writer", topic="bench", payload={"publisher": "late", "seq": seq},
+            created_at=datetime.utcnow()
+        ))
+        await session.commit()
+
+async def bench_backplane(messages: int = 2000, publishers: int = 4):
+    """
+    Relay pushes between workers through the database backplane: several publishing
+    workers and a separate subscriber worker, which must receive every message once and
+    in publish order per worker. Then commit ids out of order to check that the
+    subscriber tracks the gap, delivers the late row, and expires a gap that never fills.
+    """
+    import backplane as backplane_module
+    from backplane import DatabaseBackplane
+
+    subscriber = DatabaseBackplane(poll_interval=0.05)
+    workers = [DatabaseBackplane(poll_interval=0.05) for _ in range(publishers)]
+    received = []
+    latencies_ms = []
+    gap_timeout = backplane_module.GAP_TIMEOUT_SECONDS
+
+    def on_message(payload):
+        received.append((payload["publisher"], payload["seq"]))
+        if "sent" in payload:
+            latencies_ms.append((time.time() - payload["sent"]) * 1000)
+
+    subscriber.subscribe("bench", on_message)
+    await subscriber.start()
+    for worker in workers:
+        await worker.start()
+
+    async def publish(index: int, worker: DatabaseBackplane):
+        for seq in range(messages // publishers):
+            worker.publish("bench", {"publisher": index, "seq": seq, "sent": time.time()})
+            if seq % 20 == 0:
+                await asyncio.sleep(0.005)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(publish(index, worker) for index, worker in enumerate(workers)))
+        expected = publishers * (messages // publishers)
+        await _wait_until(lambda: len(received) >= expected)
+        elapsed = time.perf_counter() - started
+        per_publisher = {index: [seq for publisher, seq in received if publisher == index] for index in range(publishers)}
+        missing = sum(len(set(range(messages // publishers)) - set(seqs)) for seqs in per_publisher.values())
+        duplicates = len(received) - len(set(received))
+        out_of_order = sum(1 for seqs in per_publisher.values() if seqs != sorted(seqs))
+        print(f"{expected} messages from {publishers} workers relayed in {elapsed:.2f} s "
+              f"({expected / elapsed:.0f}/s), missing {missing}, duplicates {duplicates}, out of order {out_of_order}")
+        print(f"  publish -> subscriber  {latency_summary(latencies_ms)}")
+        assert not missing and not duplicates and not out_of_order, "the subscriber lost, repeated or reordered messages"
+
+        for worker in workers:
+            await worker.close()
+        workers = []
+        await asyncio.sleep(0.2)
+        received.clear()
+
+        # A row committed above an id that is still in flight leaves a gap...
+        async with async_session_maker() as session:
+            last = (await session.execute(select(func.max(BackplaneMessage.id)))).scalar_one()
+        await _insert_backplane_row(last + 2, "after-gap")
+        tracked = await _wait_until(lambda: (last + 1) in subscriber._gaps, timeout=5)
+        # ...which the subscriber fills when the lower id finally commits
+        await _insert_backplane_row(last + 1, "late")
+        filled = await _wait_until(lambda: ("late", "late") in received and (last + 1) not in subscriber._gaps, timeout=5)
+        print(f"late commit: gap tracked {tracked}, delivered late and cleared {filled}, received {[seq for _, seq in received]}")
+        assert tracked and filled, "a late commit below the last seen id was not delivered"
+
+        # A gap that never fills (rolled-back publisher) is dropped after GAP_TIMEOUT_SECONDS
+        backplane_module.GAP_TIMEOUT_SECONDS = 0.5
+        await _insert_backplane_row(last + 5, "after-abandoned-gap")
+        tracked = await _wait_until(lambda: {last + 3, last + 4} <= set(subscriber._gaps), timeout=5)
+        expired = await _wait_until(lambda: not subscriber._gaps, timeout=5)
+        print(f"abandoned ids: gaps tracked {tracked}, expired {expired}")
+        assert tracked and expired, "an abandoned gap was never given up"
+    finally:
+        for worker in workers:
+            await worker.close()
+        await subscriber.close()
+        backplane_module.GAP_TIMEOUT_SECONDS = gap_timeout
+
+SCENARIOS = {
+    "pagination": bench_pagination,
+    "order_numbers": bench_order_numbers,
+    "discount_redemption": bench_discount_redemption,
+    "order_ingest": bench_order_ingest,
+    "ws_fanout": bench_ws_fanout,
+    "login_storm": bench_login_storm,
+    "payment_gateway": bench_payment_gateway,
+    "backplane": bench_backplane,
+}
+
+async def main(name: str, *args: str):
+    await create_tables()
+    await SCENARIOS[name](*(int(arg) for arg in args))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in SCENARIOS:
+        print(f"usage: python benchmarks.py {{{'|'.join(SCENARIOS)}}} [args]")
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1], *sys.argv[2:]))
@@ -1,8 +1,8 @@
 import os
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from dotenv import load_dotenv
-import razorpay
 
 # Load environment variables
 load_dotenv()
@@ -12,9 +12,30 @@ RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID", "rzp_test_SEULnJj6ZBfPb4")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET", "hbKF4N7QaMyjDcI0FilNtPyW")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 GST_RATE = float(os.getenv("GST_RATE", "5"))
+MENU_PRECOMPRESS = os.getenv("MENU_PRECOMPRESS", "true").lower() == "true"
+ORDER_BATCH_MAX_SIZE = int(os.getenv("ORDER_BATCH_MAX_SIZE", "50"))
+ORDER_BATCH_MAX_WAIT_MS = float(os.getenv("ORDER_BATCH_MAX_WAIT_MS", "5"))
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_CLAIM_SECONDS = int(os.getenv("IDEMPOTENCY_CLAIM_SECONDS", "60"))
+DISCOUNT_CACHE_TTL_SECONDS = float(os.getenv("DISCOUNT_CACHE_TTL_SECONDS", "30"))
+KITCHEN_STATIONS = int(os.getenv("KITCHEN_STATIONS", "3"))
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
 
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+# Cross-worker events (see backplane.py): "local" for a single worker, "database" to relay through the shared database
+BACKPLANE = os.getenv("BACKPLANE", "local").lower()
+BACKPLANE_POLL_INTERVAL_MS = float(os.getenv("BACKPLANE_POLL_INTERVAL_MS", "100"))
+
+# Razorpay gateway (see payment_gateway.py); RAZORPAY_BASE_URL points it at a stand-in server for testing
+RAZORPAY_BASE_URL = os.getenv("RAZORPAY_BASE_URL") or None
+PAYMENT_GATEWAY_TIMEOUT_SECONDS = float(os.getenv("PAYMENT_GATEWAY_TIMEOUT_SECONDS", "8"))
+PAYMENT_GATEWAY_MAX_WORKERS = int(os.getenv("PAYMENT_GATEWAY_MAX_WORKERS", "8"))
+PAYMENT_BREAKER_FAILURES = int(os.getenv("PAYMENT_BREAKER_FAILURES", "5"))
+PAYMENT_BREAKER_RESET_SECONDS = float(os.getenv("PAYMENT_BREAKER_RESET_SECONDS", "30"))
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET", "")
+PAYMENT_EVENT_BATCH_SIZE = int(os.getenv("PAYMENT_EVENT_BATCH_SIZE", "100"))
+PAYMENT_RECONCILE_INTERVAL_SECONDS = float(os.getenv("PAYMENT_RECONCILE_INTERVAL_SECONDS", "300"))
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./delicacy_restaurant.db")
@@ -24,10 +45,27 @@ engine = create_async_engine(DATABASE_URL, echo=False)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
+def upgrade_schema(connection):
+    """Add columns and indexes introduced after a table was first created"""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(connection)
+
 async def create_tables():
-    """Create all database tables"""
+    """Create all database tables and apply additive schema upgrades"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
 
 async def get_db() -> AsyncSession:
     """Dependency for database session"""
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import DISCOUNT_CACHE_TTL_SECONDS
+from models import Discount
+
+class DiscountUnavailable(Exception):
+    """Raised when a discount can no longer be redeemed (limit reached, expired or deleted)"""
+
+    def __init__(self):
+        super().__init__("Discount code is no longer available")
+
+# ===================== DISCOUNT RULES =====================
+
+class DiscountRule:
+    """Detached copy of an active discount, safe to share between requests"""
+
+    def __init__(self, discount: Discount):
+        self.id = discount.id
+        self.code = discount.code
+        self.name = discount.name
+        self.discount_type = discount.discount_type
+        self.discount_value = discount.discount_value
+        self.min_order_amount = discount.min_order_amount or 0
+        self.max_discount = discount.max_discount
+        self.usage_limit = discount.usage_limit
+        self.usage_count = discount.usage_count or 0
+        self.valid_from = discount.valid_from
+        self.valid_until = discount.valid_until
+        self.is_active = discount.is_active
+
+    def unavailable_reason(self, now: Optional[datetime] = None) -> Optional[str]:
+        """Why the code can't be used right now, or None if it can"""
+        now = now or datetime.utcnow()
+        if self.valid_from and self.valid_from > now:
+            return "Discount code is not active yet"
+        if self.valid_until and self.valid_until < now:
+            return "Discount code has expired"
+        if self.usage_limit and self.usage_count >= self.usage_limit:
+            return "Discount code usage limit reached"
+        return None
+
+def redeemable_clause(now: datetime, count: int = 1):
+    """SQL condition under which count more redemptions of a discount are allowed"""
+    return and_(
+        Discount.is_active == True,
+        or_(Discount.valid_from.is_(None), Discount.valid_from <= now),
+        or_(Discount.valid_until.is_(None), Discount.valid_until >= now),
+        or_(
+            Discount.usage_limit.is_(None),
+            Discount.usage_limit == 0,
+            Discount.usage_count + count <= Discount.usage_limit
+        )
+    )
+
+async def redeem_discount(session: AsyncSession, discount_id: int, count: int = 1):
+    """
+    Atomically claim count redemptions with one conditional UPDATE; concurrent orders
+    can never push usage_count past usage_limit. Raises DiscountUnavailable otherwise.
+    """
+    result = await session.execute(
+        update(Discount)
+        .where(Discount.id == discount_id, redeemable_clause(datetime.utcnow(), count))
+        .values(usage_count=Discount.usage_count + count)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise DiscountUnavailable()
+
+# ===================== DISCOUNT ENGINE =====================
+
+class DiscountEngine:
+    """
+    In-process cache of active discount codes for the validation and pricing paths.
+    Invalidated by discount create/delete; refreshed after DISCOUNT_CACHE_TTL_SECONDS so
+    usage counts from other workers are picked up. The cache is advisory - redemption
+    is always decided by redeem_discount in the database.
+    """
+
+    def __init__(self, ttl_seconds: float = DISCOUNT_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._rules: Optional[Dict[str, DiscountRule]] = None
+        self._expires = 0.0
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Drop cached rules so the next lookup reloads them"""
+        self._version += 1
+        self._rules = None
+
+    async def _load(self, db: AsyncSession) -> Dict[str, DiscountRule]:
+        rules = self._rules
+        if rules is not None and self._expires > time.monotonic():
+            return rules
+
+        async with self._lock:
+            if self._rules is not None and self._expires > time.monotonic():
+                return self._rules
+            version = self._version
+            result = await db.execute(select(Discount).where(Discount.is_active == True))
+            rules = {discount.code: DiscountRule(discount) for discount in result.scalars().all()}
+            # Don't pin rules loaded across a create/delete
+            if version == self._version:
+                self._rules = rules
+                self._expires = time.monotonic() + self.ttl_seconds
+            return rules
+
+    async def get(self, db: AsyncSession, code: Optional[str]) -> Optional[DiscountRule]:
+        """Active rule for a code, or None"""
+        if not code:
+            return None
+        rules = await self._load(db)
+        return rules.get(code)
+
+    def record_redemption(self, discount_id: int, count: int = 1):
+        """Reflect a committed redemption in the cached usage count"""
+        for rule in (self._rules or {}).values():
+            if rule.id == discount_id:
+                rule.usage_count += count
+                break
+
+discount_engine = DiscountEngine()
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from database import async_session_maker, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_CLAIM_SECONDS
+from models import IdempotencyRecord
+
+MAX_KEY_LENGTH = 100
+# How often a duplicate re-checks a key another worker is still handling (doubling up to the max)
+CLAIM_POLL_SECONDS = 0.05
+MAX_CLAIM_POLL_SECONDS = 1.0
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of a request body, used to detect a key reused for a different request"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+# ===================== IDEMPOTENCY STORE =====================
+
+class IdempotencyStore:
+    """
+    Replays stored responses for repeated Idempotency-Key requests.
+    Hot keys live in an in-memory LRU with TTL; every response is also persisted so
+    replays survive restarts and reach other workers. A key is claimed in the database
+    (a placeholder row under the unique constraint) before the handler runs, so
+    concurrent duplicates on any worker wait for the first one instead of running the
+    handler again. A claim left behind by a crashed worker lapses after claim_seconds.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS,
+        max_entries: int = IDEMPOTENCY_CACHE_SIZE,
+        claim_seconds: int = IDEMPOTENCY_CLAIM_SECONDS
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.claim_seconds = claim_seconds
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, str, Dict]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def _cache_get(self, cache_key: Tuple[str, str]) -> Optional[Tuple[str, Dict]]:
+        entry = self._cache.get(cache_key)
+        if entry is None:
+            return None
+        expires, request_hash, response = entry
+        if expires < time.monotonic():
+            del self._cache[cache_key]
+            return None
+        self._cache.move_to_end(cache_key)
+        return request_hash, response
+
+    def _cache_put(self, cache_key: Tuple[str, str], request_hash: str, response: Dict):
+        self._cache[cache_key] = (time.monotonic() + self.ttl_seconds, request_hash, response)
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def _claim(self, scope: str, key: str, request_hash: str) -> Tuple[Optional[datetime], Optional[Dict]]:
+        """
+        Claim (scope, key) for this worker. Returns (claim, None) when the caller should run
+        the handler, or (None, response) once another worker has stored its response.
+        """
+        delay = CLAIM_POLL_SECONDS
+        while True:
+            now = datetime.utcnow()
+            claimed_until = now + timedelta(seconds=self.claim_seconds)
+            async with async_session_maker() as session:
+                session.add(IdempotencyRecord(
+                    scope=scope,
+                    key=key,
+                    request_hash=request_hash,
+                    response_json={},
+                    claimed_until=claimed_until,
+                    expires_at=claimed_until
+                ))
+                try:
+                    await session.commit()
+                    return claimed_until, None
+                except IntegrityError:
+                    await session.rollback()
+
+                result = await session.execute(
+                    select(IdempotencyRecord).where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key)
+                )
+                record = result.scalar_one_or_none()
+                if record is None:
+                    # The other claim failed and was released; try again right away
+                    continue
+                if record.expires_at <= now:
+                    # An expired response or an abandoned claim: take the row over
+                    result = await session.execute(
+                        update(IdempotencyRecord)
+                        .where(IdempotencyRecord.id == record.id, IdempotencyRecord.expires_at == record.expires_at)
+                        .values(
+                            request_hash=request_hash,
+                            response_json={},
+                            created_at=now,
+                            claimed_until=claimed_until,
+                            expires_at=claimed_until
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    await session.commit()
+                    if result.rowcount:
+                        return claimed_until, None
+                    continue
+                self._check_match(record.request_hash, request_hash)
+                if record.claimed_until is None:
+                    return None, record.response_json
+            # Another worker is still running this request
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_CLAIM_POLL_SECONDS)
+
+    async def _complete(self, scope: str, key: str, claim: datetime, response: Dict):
+        """Store the response on our claimed row; the handler already committed, so never raise"""
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    update(IdempotencyRecord)
+                    .where(
+                        IdempotencyRecord.scope == scope,
+                        IdempotencyRecord.key == key,
+                        IdempotencyRecord.claimed_until == claim
+                    )
+                    .values(
+                        response_json=response,
+                        claimed_until=None,
+                        expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+                    )
+                )
+                await session.commit()
+            if not result.rowcount:
+                print(f"Idempotency claim for {scope}/{key} lapsed before its response was stored")
+        except Exception as e:
+            print(f"Could not store idempotent response for {scope}/{key}: {e}")
+
+    async def _release(self, scope: str, key: str, claim: datetime):
+        """Drop our claim after the handler failed, so the client may retry with the same key"""
+        try:
+            async with async_session_maker() as session:
+                await session.execute(
+                    delete(IdempotencyRecord).where(
+                        IdempotencyRecord.scope == scope,
+                        IdempotencyRecord.key == key,
+                        IdempotencyRecord.claimed_until == claim
+                    )
+                )
+                await session.commit()
+        except Exception as e:
+            # The claim still lapses after claim_seconds
+            print(f"Could not release idempotency claim for {scope}/{key}: {e}")
+
+    @staticmethod
+    def _check_match(stored_hash: str, request_hash: str):
+        if stored_hash != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different request"
+            )
+
+    async def run(
+        self,
+        scope: str,
+        key: Optional[str],
+        payload: Any,
+        handler: Callable[[], Awaitable[Dict]]
+    ) -> Dict:
+        """Run handler once per (scope, key); replays return the stored response"""
+        if not key:
+            return await handler()
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+        cache_key = (scope, key)
+        request_hash = fingerprint(payload)
+
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            self._check_match(cached[0], request_hash)
+            return cached[1]
+
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            stored_hash, response = await asyncio.shield(inflight)
+            self._check_match(stored_hash, request_hash)
+            return response
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            claim, response = await self._claim(scope, key, request_hash)
+            if claim is not None:
+                try:
+                    response = await handler()
+                except BaseException:
+                    await self._release(scope, key, claim)
+                    raise
+                await self._complete(scope, key, claim, response)
+            self._cache_put(cache_key, request_hash, response)
+            future.set_result((request_hash, response))
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(cache_key, None)
+
+    async def purge_expired(self) -> int:
+        """Delete expired persisted records"""
+        async with async_session_maker() as session:
+            result = await session.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow())
+            )
+            await session.commit()
+            return result.rowcount or 0
+
+idempotency_store = IdempotencyStore()
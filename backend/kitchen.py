@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.future import select
+
+from models import Order, OrderStatus
+from kitchen_eta import kitchen_eta
+
+# Statuses the kitchen still has to act on; completed/cancelled orders leave the board
+OPEN_STATUSES = (
+    OrderStatus.PENDING.value,
+    OrderStatus.ACCEPTED.value,
+    OrderStatus.PREPARING.value,
+    OrderStatus.READY.value,
+)
+
+def kitchen_entry(order: Order, now: Optional[datetime] = None) -> Dict:
+    """Kitchen display fields for an order"""
+    now = now or datetime.utcnow()
+    return {
+        "id": order.id,
+        "order_number": order.order_number,
+        "table_number": order.table_number,
+        "customer_name": order.customer_name,
+        "customer_phone": order.customer_phone,
+        "items": order.items_json,
+        "total_amount": order.total_amount,
+        "status": order.status,
+        "payment_status": order.payment_status,
+        "notes": order.notes,
+        "created_at": order.created_at.isoformat(),
+        "time_elapsed": int((now - order.created_at).total_seconds() / 60)
+    }
+
+# ===================== KITCHEN WORKING SET =====================
+
+class KitchenBoard:
+    """
+    In-memory working set of open orders (pending -> ready), loaded once at startup and
+    kept current by the order write paths, so kitchen screens cost O(open orders)
+    instead of re-reading the whole order history on every poll. Every change is also
+    fed to the ETA model.
+    """
+
+    def __init__(self):
+        # order id -> (created_at, kitchen entry); time_elapsed is refreshed when served
+        self._orders: Dict[int, Tuple[datetime, Dict]] = {}
+        self.loaded = False
+
+    async def load(self, session):
+        """Replace the working set with the open orders currently in the database"""
+        result = await session.execute(
+            select(Order)
+            .where(Order.status.in_(OPEN_STATUSES))
+            .order_by(Order.created_at, Order.id)
+        )
+        orders = result.scalars().all()
+        self._orders = {order.id: (order.created_at, kitchen_entry(order)) for order in orders}
+        kitchen_eta.reset()
+        for order in orders:
+            kitchen_eta.observe(order)
+        self.loaded = True
+
+    def upsert(self, order: Order):
+        """Track an order after a committed write; drops it once it is no longer open"""
+        if order.status in OPEN_STATUSES:
+            self._orders[order.id] = (order.created_at, kitchen_entry(order))
+        else:
+            self._orders.pop(order.id, None)
+        kitchen_eta.observe(order)
+
+    def remove(self, order_id: int):
+        self._orders.pop(order_id, None)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def orders(self, status: Optional[str] = None) -> List[Dict]:
+        """Open orders, newest first, optionally filtered by status"""
+        now = datetime.utcnow()
+        entries = sorted(self._orders.values(), key=lambda e: (e[0], e[1]["id"]), reverse=True)
+        return [
+            {
+                **entry,
+                "time_elapsed": int((now - created_at).total_seconds() / 60),
+                **kitchen_eta.describe(entry["id"], now)
+            }
+            for created_at, entry in entries
+            if status is None or entry["status"] == status
+        ]
+
+kitchen_board = KitchenBoard()
@@ -0,0 +1,201 @@
+import asyncio
+import statistics
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from database import KITCHEN_STATIONS
+from models import Order, OrderStatus
+
+DEFAULT_PREPARATION_MINUTES = 15
+# Each extra portion on a ticket adds a little work on top of its slowest dish
+EXTRA_PORTION_MINUTES = 1
+
+# Statuses still waiting on the kitchen; ready means cooking is done
+COOKING_STATUSES = (
+    OrderStatus.PENDING.value,
+    OrderStatus.ACCEPTED.value,
+    OrderStatus.PREPARING.value,
+)
+
+# ===================== KITCHEN LOAD MODEL =====================
+
+class EtaEntry:
+    """Predicted cooking slot for one order"""
+
+    def __init__(self, order_id: int, station: int, start: datetime, duration: timedelta):
+        self.order_id = order_id
+        self.station = station
+        self.start = start
+        self.duration = duration
+        self.ready = start + duration
+
+    def shift(self, delta: timedelta):
+        self.start += delta
+        self.ready += delta
+
+class KitchenEta:
+    """
+    Queue-aware ready-time estimates for open orders. Orders are assigned to the
+    least-loaded of KITCHEN_STATIONS parallel stations in arrival order, each taking
+    its slowest dish's preparation_time plus a minute per extra portion.
+
+    Events only touch what they change: a new order is appended to one station, and
+    an order leaving the queue shifts just the orders queued behind it on its station.
+    """
+
+    def __init__(self, stations: int = KITCHEN_STATIONS):
+        self.stations = max(1, stations)
+        self.prep_times: Dict[int, int] = {}
+        self._menu_version = None
+        self.reset()
+
+    def reset(self):
+        self._entries: Dict[int, EtaEntry] = {}
+        self._queues: List[List[int]] = [[] for _ in range(self.stations)]
+
+    def use_menu(self, snapshot):
+        """Refresh preparation times from a menu snapshot (no-op for the same version)"""
+        if snapshot.version == self._menu_version:
+            return
+        self.prep_times = {
+            item["id"]: item.get("preparation_time") or DEFAULT_PREPARATION_MINUTES
+            for item in snapshot.items
+        }
+        self._menu_version = snapshot.version
+
+    def duration(self, items: List[Dict]) -> timedelta:
+        """Expected cooking time for an order's line items"""
+        if not items:
+            return timedelta(0)
+        slowest = max(
+            self.prep_times.get(item.get("menu_item_id"), DEFAULT_PREPARATION_MINUTES)
+            for item in items
+        )
+        portions = sum(item.get("quantity", 1) for item in items)
+        return timedelta(minutes=slowest + EXTRA_PORTION_MINUTES * max(0, portions - 1))
+
+    def _tail(self, station: int, now: datetime) -> datetime:
+        queue = self._queues[station]
+        if not queue:
+            return now
+        return max(now, self._entries[queue[-1]].ready)
+
+    def add(self, order_id: int, items: List[Dict], now: Optional[datetime] = None) -> EtaEntry:
+        """Queue an order behind everything already on the least-loaded station"""
+        now = now or datetime.utcnow()
+        station = min(range(self.stations), key=lambda s: self._tail(s, now))
+        entry = EtaEntry(order_id, station, self._tail(station, now), self.duration(items))
+        self._entries[order_id] = entry
+        self._queues[station].append(order_id)
+        return entry
+
+    def finish(self, order_id: int, now: Optional[datetime] = None):
+        """Drop an order that is ready or cancelled and move its station's queue accordingly"""
+        entry = self._entries.pop(order_id, None)
+        if entry is None:
+            return
+        now = now or datetime.utcnow()
+        queue = self._queues[entry.station]
+        position = queue.index(order_id)
+        del queue[position]
+        # The slot now ends at max(start, now) instead of the predicted ready time;
+        # early finishes pull the orders behind it forward, late ones push them back
+        delta = max(entry.start, now) - entry.ready
+        if delta:
+            for queued_id in queue[position:]:
+                self._entries[queued_id].shift(delta)
+
+    def observe(self, order: Order, now: Optional[datetime] = None):
+        """Apply an order's current status: track it while cooking, release it after"""
+        if order.status in COOKING_STATUSES:
+            if order.id not in self._entries:
+                self.add(order.id, order.items_json or [], now)
+        else:
+            self.finish(order.id, now)
+
+    def estimate(self, order_id: int, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Predicted ready time, or None when the order isn't cooking"""
+        entry = self._entries.get(order_id)
+        if entry is None:
+            return None
+        now = now or datetime.utcnow()
+        # If the station's current ticket is overdue, everything behind it slips too
+        head = self._entries[self._queues[entry.station][0]]
+        lateness = max(timedelta(0), now - head.ready)
+        return entry.ready + lateness
+
+    def describe(self, order_id: int, now: Optional[datetime] = None) -> Dict:
+        """ETA fields for API payloads"""
+        now = now or datetime.utcnow()
+        ready = self.estimate(order_id, now)
+        if ready is None:
+            return {"estimated_ready_at": None, "eta_minutes": None}
+        return {
+            "estimated_ready_at": ready.isoformat(),
+            "eta_minutes": max(0, int((ready - now).total_seconds() // 60 + 1))
+        }
+
+kitchen_eta = KitchenEta()
+
+# ===================== REPLAY HARNESS =====================
+
+async def replay(limit: Optional[int] = None) -> Dict:
+    """
+    Replay completed orders through a fresh model in created_at/completed_at order and
+    score the predicted ready time made at order creation against completed_at.
+    completed_at is when the order was served, so errors skew towards underestimates.
+    """
+    from sqlalchemy.future import select
+    from database import async_session_maker
+    from menu_cache import menu_cache
+
+    async with async_session_maker() as session:
+        snapshot = await menu_cache.get_snapshot(session)
+        query = (
+            select(Order)
+            .where(Order.completed_at.isnot(None))
+            .order_by(Order.created_at, Order.id)
+        )
+        if limit:
+            query = query.limit(limit)
+        result = await session.execute(query)
+        orders = result.scalars().all()
+
+    model = KitchenEta()
+    model.use_menu(snapshot)
+    events = [(order.created_at, 1, order) for order in orders]
+    events += [(order.completed_at, 0, order) for order in orders]
+    events.sort(key=lambda event: (event[0], event[1], event[2].id))
+
+    errors = []
+    predictions = {}
+    for at, is_arrival, order in events:
+        if is_arrival:
+            model.add(order.id, order.items_json or [], at)
+            predictions[order.id] = model.estimate(order.id, at)
+        else:
+            model.finish(order.id, at)
+            predicted = predictions.get(order.id)
+            if predicted is not None:
+                errors.append((order.completed_at - predicted).total_seconds() / 60)
+
+    if not errors:
+        return {"orders": 0}
+    absolute = sorted(abs(error) for error in errors)
+    return {
+        "orders": len(errors),
+        "mean_error_minutes": round(statistics.mean(errors), 2),
+        "mean_absolute_error_minutes": round(statistics.mean(absolute), 2),
+        "median_absolute_error_minutes": round(statistics.median(absolute), 2),
+        "p90_absolute_error_minutes": round(absolute[int(0.9 * (len(absolute) - 1))], 2),
+    }
+
+async def main(limit: Optional[int] = None):
+    summary = await replay(limit)
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    # Score the estimator against history: python kitchen_eta.py [limit]
+    import sys
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else None))
@@ -0,0 +1,178 @@
+import asyncio
+import gzip
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import MENU_PRECOMPRESS
+from models import Category, MenuChange, MenuItem, MenuItemResponse
+from pricing import PriceTable
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# ===================== ENCODED MENU VARIANTS =====================
+
+def negotiate_encoding(accept_encoding: Optional[str], available: List[str]) -> Optional[str]:
+    """Pick the best available content-coding allowed by an Accept-Encoding header"""
+    if not accept_encoding or not available:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[token.strip().lower()] = quality
+    best = None
+    best_quality = 0.0
+    for encoding in available:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+class MenuVariant:
+    """One filtered menu view, JSON-encoded and compressed exactly once"""
+
+    def __init__(self, items: List[Dict]):
+        self.items = items
+        self.body = json.dumps(items, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.encoded: Dict[str, bytes] = {}
+        if MENU_PRECOMPRESS:
+            candidates = {"gzip": gzip.compress(self.body, compresslevel=9)}
+            if brotli is not None:
+                candidates["br"] = brotli.compress(self.body)
+            # Preference order: brotli first, then gzip; skip codings that don't help
+            for encoding in ("br", "gzip"):
+                if encoding in candidates and len(candidates[encoding]) < len(self.body):
+                    self.encoded[encoding] = candidates[encoding]
+        self.etags = [self.etag] + [f'"{digest}-{encoding}"' for encoding in self.encoded]
+
+    def representation(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str], str]:
+        """Return (body, content-encoding, etag) for the negotiated representation"""
+        encoding = negotiate_encoding(accept_encoding, list(self.encoded))
+        if encoding is None:
+            return self.body, None, self.etag
+        return self.encoded[encoding], encoding, f'"{self.etag[1:-1]}-{encoding}"'
+
+# ===================== MENU SNAPSHOT =====================
+
+class MenuSnapshot:
+    """Immutable view of the menu at a given cache version"""
+
+    def __init__(self, version: int, revision: int, items: List[MenuItem], categories: List[Category]):
+        self.version = version
+        self.revision = revision
+        self.items: List[Dict] = [
+            MenuItemResponse.model_validate(item).model_dump() for item in items
+        ]
+        self.items_by_id: Dict[int, Dict] = {item["id"]: item for item in self.items}
+        self.available_items: List[Dict] = [item for item in self.items if item["is_available"]]
+        self.category_ids: Dict[str, int] = {category.name: category.id for category in categories}
+        self._views: Dict[Tuple, MenuVariant] = {}
+        self._price_table: Optional[PriceTable] = None
+
+    def price_table(self) -> PriceTable:
+        """Price lookup table for this snapshot, built on first use"""
+        if self._price_table is None:
+            self._price_table = PriceTable(self.items)
+        return self._price_table
+
+    def resolve_category(self, category: Optional[str]) -> Optional[int]:
+        """Resolve a category id or name to its id (-1 when the name is unknown)"""
+        if not category or category == 'undefined':
+            return None
+        try:
+            return int(category)
+        except ValueError:
+            return self.category_ids.get(category, -1)
+
+    def view(
+        self,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+        is_vegetarian: Optional[bool] = None
+    ) -> MenuVariant:
+        """Return the encoded menu variant for the given filters"""
+        if subcategory == 'undefined':
+            subcategory = None
+        key = (self.resolve_category(category), subcategory or None, is_vegetarian)
+        cached = self._views.get(key)
+        if cached is not None:
+            return cached
+
+        category_id, subcategory, is_vegetarian = key
+        items = self.available_items
+        if category_id is not None:
+            items = [item for item in items if item["category_id"] == category_id]
+        if subcategory:
+            items = [item for item in items if item["subcategory"] == subcategory]
+        if is_vegetarian is not None:
+            items = [item for item in items if item["is_vegetarian"] == is_vegetarian]
+
+        cached = MenuVariant(items)
+        self._views[key] = cached
+        return cached
+
+# ===================== MENU CACHE =====================
+
+class MenuCache:
+    """Versioned in-process menu cache, invalidated by every menu mutation"""
+
+    def __init__(self):
+        self.version = 0
+        self._snapshot: Optional[MenuSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Drop the current snapshot so the next read reloads the menu"""
+        self.version += 1
+        self._snapshot = None
+
+    async def get_snapshot(self, db: AsyncSession) -> MenuSnapshot:
+        """Return the current snapshot, loading it from the database if needed"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        async with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+
+            version = self.version
+            # Read the revision first so a change racing the load is re-sent as a delta
+            revision_result = await db.execute(select(func.max(MenuChange.id)))
+            items_result = await db.execute(select(MenuItem).order_by(MenuItem.id))
+            categories_result = await db.execute(select(Category))
+            snapshot = MenuSnapshot(
+                version,
+                revision_result.scalar_one() or 0,
+                items_result.scalars().all(),
+                categories_result.scalars().all()
+            )
+            # A mutation may have landed while we were reading; don't pin stale data
+            if version == self.version:
+                self._snapshot = snapshot
+            return snapshot
+
+def etag_matches(if_none_match: Optional[str], etags: List[str]) -> bool:
+    """Check an If-None-Match header value against a variant's ETags"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(etag in candidates for etag in etags)
+
+menu_cache = MenuCache()
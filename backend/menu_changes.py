@@ -0,0 +1,85 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models import Category, CategoryResponse, MenuChange, MenuItem, MenuItemResponse
+from routes.websockets import manager
+
+# Deltas longer than this are cheaper to replace with a full menu fetch
+MAX_DELTA_CHANGES = 500
+
+# ===================== RECORDING =====================
+
+def item_payload(item: MenuItem) -> Dict:
+    """Serialize a menu item the way GET /api/menu returns it"""
+    return MenuItemResponse.model_validate(item).model_dump()
+
+def category_payload(category: Category) -> Dict:
+    """Serialize a category the way GET /api/categories returns it"""
+    return CategoryResponse.model_validate(category).model_dump(mode="json")
+
+def change_to_dict(change: MenuChange) -> Dict:
+    """Wire format of a single change record"""
+    return {
+        "revision": change.id,
+        "entity": change.entity,
+        "action": change.action,
+        "id": change.entity_id,
+        "data": change.payload
+    }
+
+async def record_menu_change(
+    db: AsyncSession,
+    entity: str,
+    action: str,
+    entity_id: Optional[int] = None,
+    payload: Optional[Dict] = None
+) -> MenuChange:
+    """Append a change record in the caller's transaction (commit is left to the caller)"""
+    change = MenuChange(entity=entity, action=action, entity_id=entity_id, payload=payload)
+    db.add(change)
+    await db.flush()
+    return change
+
+async def publish_menu_changes(changes: List[MenuChange]):
+    """Push committed change records to every connected screen"""
+    if not changes:
+        return
+    await manager.broadcast_menu({
+        "type": "menu_changed",
+        "revision": changes[-1].id,
+        "changes": [change_to_dict(change) for change in changes]
+    })
+
+# ===================== READING =====================
+
+async def get_menu_revision(db: AsyncSession) -> int:
+    """Current menu revision (0 before any change has been recorded)"""
+    result = await db.execute(select(func.max(MenuChange.id)))
+    return result.scalar_one() or 0
+
+async def get_menu_changes(db: AsyncSession, since: int) -> Dict:
+    """Collapse the change log after a revision into the latest state per entity"""
+    revision = await get_menu_revision(db)
+    if since <= 0 or since > revision:
+        return {"revision": revision, "resync": True, "changes": []}
+
+    result = await db.execute(
+        select(MenuChange).where(MenuChange.id > since).order_by(MenuChange.id).limit(MAX_DELTA_CHANGES + 1)
+    )
+    changes = result.scalars().all()
+    if len(changes) > MAX_DELTA_CHANGES or any(change.action == "reset" for change in changes):
+        return {"revision": revision, "resync": True, "changes": []}
+
+    latest: Dict = {}
+    for change in changes:
+        key = (change.entity, change.entity_id)
+        latest.pop(key, None)
+        latest[key] = change
+    return {
+        "revision": changes[-1].id if changes else since,
+        "resync": False,
+        "changes": [change_to_dict(change) for change in latest.values()]
+    }
@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models import Category, MenuItem, MenuItemImport
+
+# Columns written from an import row onto a MenuItem
+ITEM_FIELDS = [
+    "name", "description", "price_half", "price_full", "price", "category_id",
+    "subcategory", "image_url", "is_available", "is_vegetarian", "has_half_full",
+    "preparation_time", "calories", "spice_level"
+]
+
+# Keep bound parameters per statement well under SQLite's limit
+BATCH_SIZE = 500
+
+class MenuImportError(ValueError):
+    """Raised when an import payload cannot be parsed or validated"""
+
+# ===================== PARSING =====================
+
+def make_item_key(name: str) -> str:
+    """Derive a stable item key from an item name (e.g. 'Chicken 65' -> 'chicken-65')"""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+def parse_menu_csv(text: str) -> List[Dict]:
+    """Parse CSV text with a header row into import rows (blank cells become unset)"""
+    reader = csv.DictReader(io.StringIO(text))
+    return [
+        {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+        for row in reader
+    ]
+
+def parse_menu_json(text: str) -> List[Dict]:
+    """Parse a JSON list of rows, or an object with an 'items' list"""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise MenuImportError(f"Invalid JSON: {e}")
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list):
+        raise MenuImportError("Expected a list of menu items or an object with an 'items' list")
+    return data
+
+def format_row_errors(error: ValidationError) -> str:
+    """Condense pydantic errors to 'field: message' pairs (e.g. 'price_full: Input should be a valid number')"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}"
+        for e in error.errors()
+    )
+
+def validate_rows(rows: Iterable[Dict]) -> List[MenuItemImport]:
+    """Validate raw rows, de-duplicating by item key (last row wins)"""
+    by_key: Dict[str, MenuItemImport] = {}
+    for index, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise MenuImportError(f"Row {index}: expected an object with menu item fields")
+        try:
+            item = MenuItemImport(**row)
+        except ValidationError as e:
+            raise MenuImportError(f"Row {index}: {format_row_errors(e)}")
+        item.key = item.key or make_item_key(item.name)
+        by_key[item.key] = item
+    return list(by_key.values())
+
+# ===================== UPSERT =====================
+
+def _chunks(values: List, size: int = BATCH_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+async def upsert_menu(db: AsyncSession, rows: Iterable[Dict]) -> Dict:
+    """
+    Upsert categories and menu items with batched statements (the caller commits).
+    Besides the counts, 'changes' lists (entity, action, id) for every row written so
+    the caller can record per-entity menu changes.
+    """
+    items = validate_rows(rows)
+    if not items:
+        return {"created": 0, "updated": 0, "unchanged": 0, "categories_created": 0, "changes": []}
+
+    # Categories: one lookup, one batched insert for the missing ones, one re-read for ids
+    category_names = list(dict.fromkeys(item.category for item in items))
+    result = await db.execute(select(Category).where(Category.name.in_(category_names)))
+    categories = {category.name: category for category in result.scalars().all()}
+    missing = [{"name": name} for name in category_names if name not in categories]
+    if missing:
+        await db.execute(insert(Category), missing)
+    inactive = [category.id for category in categories.values() if not category.is_active]
+    if inactive:
+        await db.execute(
+            update(Category).where(Category.id.in_(inactive)).values(is_active=True)
+        )
+    result = await db.execute(
+        select(Category.name, Category.id).where(Category.name.in_(category_names))
+    )
+    category_ids = dict(result.all())
+    changes: List[Tuple[str, str, int]] = [
+        ("category", "created", category_ids[category["name"]]) for category in missing
+    ]
+    changes += [("category", "updated", category_id) for category_id in inactive]
+
+    # Existing items by stable key, falling back to name for rows created before keys existed
+    keys = [item.key for item in items]
+    existing: Dict[str, MenuItem] = {}
+    for batch in _chunks(keys):
+        result = await db.execute(select(MenuItem).where(MenuItem.item_key.in_(batch)))
+        for db_item in result.scalars().all():
+            existing[db_item.item_key] = db_item
+    unkeyed_names = {item.name: item.key for item in items if item.key not in existing}
+    if unkeyed_names:
+        result = await db.execute(
+            select(MenuItem).where(
+                MenuItem.item_key.is_(None),
+                MenuItem.name.in_(list(unkeyed_names))
+            )
+        )
+        for db_item in result.scalars().all():
+            existing.setdefault(unkeyed_names[db_item.name], db_item)
+
+    to_insert: List[Dict] = []
+    to_update: List[Dict] = []
+    unchanged = 0
+    now = datetime.utcnow()
+    for item in items:
+        values = item.dict(exclude={"key", "category"})
+        values["category_id"] = category_ids[item.category]
+        db_item = existing.get(item.key)
+        if db_item is None:
+            to_insert.append({"item_key": item.key, **values})
+        elif db_item.item_key != item.key or any(
+            getattr(db_item, field) != values[field] for field in ITEM_FIELDS
+        ):
+            # Bulk updates by primary key skip the column's onupdate, so stamp it here
+            to_update.append({"id": db_item.id, "item_key": item.key, "updated_at": now, **values})
+        else:
+            unchanged += 1
+
+    for batch in _chunks(to_insert):
+        await db.execute(insert(MenuItem), batch)
+        result = await db.execute(
+            select(MenuItem.id).where(MenuItem.item_key.in_([row["item_key"] for row in batch]))
+        )
+        changes += [("item", "created", item_id) for item_id in result.scalars().all()]
+    for batch in _chunks(to_update):
+        await db.execute(update(MenuItem), batch)
+    changes += [("item", "updated", row["id"]) for row in to_update]
+
+    return {
+        "created": len(to_insert),
+        "updated": len(to_update),
+        "unchanged": unchanged,
+        "categories_created": len(missing),
+        "changes": changes
+    }
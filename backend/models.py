@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import List, Optional, Dict
 from enum import Enum
 from pydantic import BaseModel, Field, validator
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -17,6 +17,16 @@ class OrderStatus(str, Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+# Allowed order status transitions; completed and cancelled are terminal
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.PENDING.value: {OrderStatus.ACCEPTED.value, OrderStatus.CANCELLED.value},
+    OrderStatus.ACCEPTED.value: {OrderStatus.PREPARING.value, OrderStatus.CANCELLED.value},
+    OrderStatus.PREPARING.value: {OrderStatus.READY.value, OrderStatus.CANCELLED.value},
+    OrderStatus.READY.value: {OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value},
+    OrderStatus.COMPLETED.value: set(),
+    OrderStatus.CANCELLED.value: set(),
+}
+
 class PaymentStatus(str, Enum):
     PENDING = "pending"
     PAID = "paid"
@@ -73,6 +83,7 @@ class MenuItem(Base):
     __tablename__ = "menu_items"
     
     id = Column(Integer, primary_key=True, index=True)
+    item_key = Column(String(100), unique=True, index=True, nullable=True)  # stable key for bulk imports
     name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
     price_half = Column(Float, nullable=True)
@@ -92,6 +103,17 @@ class MenuItem(Base):
     
     category = relationship("Category")
 
+class MenuChange(Base):
+    """Append-only menu change log; the id doubles as the menu revision"""
+    __tablename__ = "menu_changes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String(20), nullable=False)  # item, category, menu
+    entity_id = Column(Integer, nullable=True)
+    action = Column(String(20), nullable=False)  # created, updated, toggled, deleted, reset
+    payload = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Discount(Base):
     """Discount and coupon model"""
     __tablename__ = "discounts"
@@ -114,6 +136,13 @@ class Discount(Base):
 class Order(Base):
     """Order model"""
     __tablename__ = "orders"
+    # Composite indexes for keyset pagination on (created_at, id), with and without list filters
+    __table_args__ = (
+        Index("ix_orders_created_id", "created_at", "id"),
+        Index("ix_orders_status_created_id", "status", "created_at", "id"),
+        Index("ix_orders_payment_status_created_id", "payment_status", "created_at", "id"),
+        Index("ix_orders_table_created_id", "table_number", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     order_number = Column(String(20), unique=True, nullable=False)
@@ -130,6 +159,7 @@ class Order(Base):
     status = Column(String(20), default=OrderStatus.PENDING)
     payment_status = Column(String(20), default=PaymentStatus.PENDING)
     payment_id = Column(String(100), nullable=True)
+    razorpay_order_id = Column(String(50), unique=True, index=True, nullable=True)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -138,9 +168,12 @@ class Order(Base):
 class OrderItem(Base):
     """Individual order items for detailed tracking"""
     __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_menu_item_created", "menu_item_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     menu_item_id = Column(Integer, nullable=False)
     name = Column(String(100), nullable=False)
     price = Column(Float, nullable=False)
@@ -149,6 +182,51 @@ class OrderItem(Base):
     notes = Column(String(200), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class IdempotencyRecord(Base):
+    """Stored responses for requests carrying an Idempotency-Key header"""
+    __tablename__ = "idempotency_records"
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_scope_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(50), nullable=False)
+    key = Column(String(100), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    response_json = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    # Set while a worker is still running the request (response_json is empty until then)
+    claimed_until = Column(DateTime, nullable=True)
+
+class PaymentEvent(Base):
+    """Payment gateway event (webhook or reconciliation) queued for the payment worker"""
+    __tablename__ = "payment_events"
+    __table_args__ = (
+        Index("ix_payment_events_status_id", "status", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String(100), unique=True, index=True, nullable=False)
+    event_type = Column(String(50), nullable=False)
+    payment_id = Column(String(100), nullable=True, index=True)
+    razorpay_order_id = Column(String(50), nullable=True, index=True)
+    payload = Column(JSON, nullable=True)
+    status = Column(String(20), default="pending")  # pending, applied, duplicate, ignored, unmatched
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+class BackplaneMessage(Base):
+    """Cross-worker message relayed by the database backplane; pruned after a minute"""
+    __tablename__ = "backplane_messages"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    origin = Column(String(32), nullable=False)
+    topic = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 class AnalyticsEvent(Base):
     """Analytics events for reporting"""
     __tablename__ = "analytics_events"
@@ -254,6 +332,31 @@ class MenuItemResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MenuItemImport(BaseModel):
+    """Schema for one row of a bulk menu import"""
+    key: Optional[str] = None
+    name: str = Field(..., min_length=1)
+    category: str = Field(..., min_length=1)
+    description: Optional[str] = None
+    price_half: Optional[float] = None
+    price_full: Optional[float] = None
+    price: Optional[float] = None
+    subcategory: Optional[str] = None
+    image_url: Optional[str] = None
+    is_available: bool = True
+    is_vegetarian: bool = False
+    has_half_full: bool = False
+    preparation_time: int = 15
+    calories: Optional[int] = None
+    spice_level: int = 0
+
+class MenuImportResult(BaseModel):
+    """Schema for bulk menu import summary"""
+    created: int
+    updated: int
+    unchanged: int
+    categories_created: int
+
 class CartItem(BaseModel):
     """Cart item schema"""
     menu_item_id: int
@@ -356,6 +459,11 @@ class OrderStatusUpdate(BaseModel):
     """Schema for updating order status"""
     status: str
 
+class OrderBulkStatusUpdate(BaseModel):
+    """Schema for moving several orders to one status"""
+    order_ids: List[int]
+    status: str
+
 class AnalyticsQuery(BaseModel):
     """Schema for analytics query"""
     start_date: Optional[str] = None
@@ -0,0 +1,149 @@
+import asyncio
+from collections import Counter
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from database import async_session_maker, ORDER_BATCH_MAX_SIZE, ORDER_BATCH_MAX_WAIT_MS
+from discounts import redeem_discount
+from models import Order, OrderItem
+from order_items import order_item_rows
+
+# ===================== GROUP-COMMIT ORDER INGEST =====================
+
+class PendingOrder:
+    """An order waiting for the next group commit"""
+
+    def __init__(self, order: Order, discount_id: Optional[int], future: asyncio.Future):
+        self.order = order
+        self.discount_id = discount_id
+        self.future = future
+
+class OrderIngestQueue:
+    """
+    Collects orders for up to max_wait_ms (or max_batch_size orders) and writes them in
+    one transaction, so a burst of checkouts costs one commit instead of one per order.
+    """
+
+    def __init__(self, max_batch_size: int = ORDER_BATCH_MAX_SIZE, max_wait_ms: float = ORDER_BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, order: Order, discount_id: Optional[int] = None) -> Order:
+        """Queue an order and wait until its batch is committed; returns it with id populated"""
+        if self.max_batch_size == 1:
+            await self._write([PendingOrder(order, discount_id, None)])
+            return order
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(PendingOrder(order, discount_id, future))
+        # Shield so a disconnecting client doesn't cancel the shared batch result
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        batch: List[PendingOrder] = []
+        try:
+            while not stopping:
+                first = await self._queue.get()
+                if first is None:
+                    break
+                batch = [first]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        pending = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    if pending is None:
+                        stopping = True
+                        break
+                    batch.append(pending)
+                await self._commit_batch(batch)
+                batch = []
+        except Exception as e:
+            # The next submit() starts a fresh worker
+            print(f"Order ingest worker failed: {e}")
+        finally:
+            # However the worker ends, nobody may be left waiting on a batch it won't commit
+            error = RuntimeError("Order ingest worker stopped")
+            for pending in batch:
+                self._resolve(pending, error=error)
+            while not self._queue.empty():
+                pending = self._queue.get_nowait()
+                if pending is not None:
+                    self._resolve(pending, error=error)
+
+    async def _commit_batch(self, batch: List[PendingOrder]):
+        """Write a batch; if it fails, retry orders one by one so only the bad one errors"""
+        try:
+            await self._write(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0], error=e)
+                return
+            for pending in batch:
+                try:
+                    await self._write([pending])
+                except Exception as single_error:
+                    self._resolve(pending, error=single_error)
+                else:
+                    self._resolve(pending)
+            return
+        for pending in batch:
+            self._resolve(pending)
+
+    @staticmethod
+    def _resolve(pending: PendingOrder, error: Optional[Exception] = None):
+        if pending.future is None or pending.future.done():
+            return
+        if error is not None:
+            pending.future.set_exception(error)
+        else:
+            pending.future.set_result(pending.order)
+
+    async def _write(self, batch: List[PendingOrder]):
+        """Insert orders, their line items and discount usage in a single transaction"""
+        async with async_session_maker() as session:
+            try:
+                session.add_all([pending.order for pending in batch])
+                await session.flush()
+                rows = []
+                for pending in batch:
+                    order = pending.order
+                    rows.extend(order_item_rows(order.id, order.created_at, order.items_json))
+                if rows:
+                    await session.execute(insert(OrderItem), rows)
+                # Conditional redemption: if a code can't cover the whole batch, the batch
+                # is retried order by order and only the orders past the limit fail
+                usage = Counter(pending.discount_id for pending in batch if pending.discount_id)
+                for discount_id, count in usage.items():
+                    await redeem_discount(session, discount_id, count)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                # Detach the failed objects so a retry can add them to a fresh session
+                for pending in batch:
+                    pending.order.id = None
+                raise
+
+    async def close(self):
+        """Stop the worker after committing anything already queued"""
+        if self._worker is None or self._worker.done():
+            return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+order_ingest = OrderIngestQueue()
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import exists, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import async_session_maker, create_tables
+from models import Order, OrderItem
+
+BACKFILL_BATCH_SIZE = 500
+
+def order_item_rows(order_id: int, created_at: datetime, items: List[Dict]) -> List[Dict]:
+    """Map items_json entries to OrderItem rows for a bulk insert"""
+    return [
+        {
+            "order_id": order_id,
+            "menu_item_id": item["menu_item_id"],
+            "name": item["name"],
+            "price": item["price"],
+            "quantity": item["quantity"],
+            "half_full": item.get("half_full"),
+            "notes": item.get("notes"),
+            "created_at": created_at
+        }
+        for item in items
+    ]
+
+def missing_items_clause():
+    """Filter for orders that have no OrderItem rows yet"""
+    return ~exists().where(OrderItem.order_id == Order.id)
+
+async def count_orders_missing_items(db: AsyncSession) -> int:
+    """Number of orders whose items_json has not been normalized into order_items"""
+    result = await db.execute(select(func.count()).select_from(Order).where(missing_items_clause()))
+    return result.scalar_one()
+
+async def backfill_order_items(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Stream existing orders' items_json into order_items, one batch per transaction"""
+    backfilled = 0
+    last_id = 0
+    async with async_session_maker() as session:
+        while True:
+            result = await session.execute(
+                select(Order.id, Order.created_at, Order.items_json)
+                .where(Order.id > last_id, missing_items_clause())
+                .order_by(Order.id)
+                .limit(batch_size)
+            )
+            batch = result.all()
+            if not batch:
+                break
+            rows = []
+            for order_id, created_at, items in batch:
+                rows.extend(order_item_rows(order_id, created_at, items or []))
+            if rows:
+                await session.execute(insert(OrderItem), rows)
+            await session.commit()
+            backfilled += len(batch)
+            last_id = batch[-1][0]
+            print(f"Backfilled order items for {backfilled} orders (up to order #{last_id})")
+    return backfilled
+
+async def main():
+    await create_tables()
+    total = await backfill_order_items()
+    print(f"Done - backfilled {total} orders")
+
+if __name__ == "__main__":
+    # One-off: python order_items.py
+    asyncio.run(main())
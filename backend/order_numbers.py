@@ -0,0 +1,126 @@
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to a pid-derived node id
+    fcntl = None
+
+# ===================== SNOWFLAKE-STYLE ORDER IDS =====================
+# 41 bits of milliseconds since EPOCH_MS | 10 bits node id | 12 bits sequence
+
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE_ID = (1 << NODE_BITS) - 1
+# With ORDER_NODE_ID set, the node id is split into a host id and a per-host worker slot
+WORKER_BITS = 5
+MAX_HOST_ID = (1 << (NODE_BITS - WORKER_BITS)) - 1
+MAX_WORKER_SLOT = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# Crockford base32: no I, L, O or U, so numbers read back unambiguously
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ORDER_PREFIX = "ORD"
+
+def encode_base32(value: int) -> str:
+    """Encode a non-negative integer in Crockford base32"""
+    digits = []
+    while True:
+        value, remainder = divmod(value, 32)
+        digits.append(ALPHABET[remainder])
+        if not value:
+            break
+    return "".join(reversed(digits))
+
+class OrderNumberGenerator:
+    """
+    Generates unique, roughly time-ordered order numbers without touching the database.
+    Each process claims a free lock-file slot shared by all workers on the host, so
+    concurrent uvicorn workers never hand out the same number. Containers/hosts are told
+    apart by ORDER_NODE_ID (0-31), which becomes the high bits of the node id with the
+    worker's slot (0-31) below it.
+    """
+
+    def __init__(self, node_id: Optional[int] = None):
+        self._configured_node_id = node_id
+        self._lock = threading.Lock()
+        self._pid = None
+        self._node_id = 0
+        self._lock_file = None
+        self._last_ms = -1
+        self._sequence = 0
+
+    @property
+    def node_id(self) -> int:
+        self._ensure_node()
+        return self._node_id
+
+    def _claim_node_slot(self, max_slot: int = MAX_NODE_ID) -> int:
+        """Hold an exclusive lock on the first free per-host slot for the life of the process"""
+        if fcntl is None:
+            return os.getpid() & max_slot
+        directory = os.path.join(tempfile.gettempdir(), "delicacy-order-nodes")
+        os.makedirs(directory, exist_ok=True)
+        start = os.getpid() & max_slot
+        for offset in range(max_slot + 1):
+            slot = (start + offset) & max_slot
+            handle = open(os.path.join(directory, f"{slot}.lock"), "a")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                continue
+            self._lock_file = handle
+            return slot
+        raise RuntimeError("No free order node id slots on this host")
+
+    def _ensure_node(self):
+        # Re-claim after fork so child workers never inherit the parent's node id
+        if self._pid == os.getpid():
+            return
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        node_id = self._configured_node_id
+        if node_id is None and os.getenv("ORDER_NODE_ID"):
+            # Several workers share one host id, so each still needs its own slot
+            host_id = int(os.getenv("ORDER_NODE_ID"))
+            if not 0 <= host_id <= MAX_HOST_ID:
+                raise ValueError(f"ORDER_NODE_ID must be between 0 and {MAX_HOST_ID}")
+            node_id = (host_id << WORKER_BITS) | self._claim_node_slot(MAX_WORKER_SLOT)
+        if node_id is None:
+            node_id = self._claim_node_slot()
+        if not 0 <= node_id <= MAX_NODE_ID:
+            raise ValueError(f"Order node id must be between 0 and {MAX_NODE_ID}")
+        self._node_id = node_id
+        self._pid = os.getpid()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        """Next 63-bit id; thread-safe and monotonic within the process"""
+        with self._lock:
+            self._ensure_node()
+            now_ms = int(time.time() * 1000) - EPOCH_MS
+            # Never go backwards if the wall clock is adjusted
+            if now_ms < self._last_ms:
+                now_ms = self._last_ms
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond; borrow the next one
+                    now_ms = self._last_ms + 1
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return (now_ms << (NODE_BITS + SEQUENCE_BITS)) | (self._node_id << SEQUENCE_BITS) | self._sequence
+
+    def next_order_number(self) -> str:
+        """Next order number, e.g. ORD1F3K9Q2M7X0A4"""
+        return f"{ORDER_PREFIX}{encode_base32(self.next_id())}"
+
+order_numbers = OrderNumberGenerator()
@@ -0,0 +1,115 @@
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from models import Order
+
+# ===================== ORDER COUNTERS =====================
+
+class StatsBucket:
+    """Order counts by status and payment status, plus paid revenue, for one period"""
+
+    def __init__(self):
+        self.orders = 0
+        self.by_status: Counter = Counter()
+        self.by_payment: Counter = Counter()
+        self.paid_revenue = 0.0
+
+    def add(self, status: str, payment_status: str, amount: float, sign: int = 1):
+        self.orders += sign
+        self.by_status[status] += sign
+        self.by_payment[payment_status] += sign
+        if payment_status == "paid":
+            self.paid_revenue += sign * (amount or 0)
+
+    @property
+    def paid_orders(self) -> int:
+        return self.by_payment["paid"]
+
+    @property
+    def revenue(self) -> float:
+        return round(self.paid_revenue, 2)
+
+def _value(status) -> str:
+    # Column defaults leave enum members on fresh objects; count them by their string value
+    return getattr(status, "value", status)
+
+def _as_date(value) -> date:
+    # SQLite returns date() as a string, other backends as a date
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+class OrderCounters:
+    """
+    Per-day, per-month and all-time order counters, updated as orders are created,
+    change status or get paid, so the stats endpoints are O(1) reads regardless of
+    how much order history exists. Rebuilt from the orders table on startup or on demand.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.days: Dict[date, StatsBucket] = {}
+        self.months: Dict[Tuple[int, int], StatsBucket] = {}
+        self.all_time = StatsBucket()
+
+    def _buckets(self, created_at: datetime):
+        day = created_at.date()
+        if day not in self.days:
+            self.days[day] = StatsBucket()
+        month = (day.year, day.month)
+        if month not in self.months:
+            self.months[month] = StatsBucket()
+        return self.days[day], self.months[month], self.all_time
+
+    def _add(self, created_at: datetime, status: str, payment_status: str, amount: float, count: int):
+        for bucket in self._buckets(created_at):
+            bucket.add(status, payment_status, amount, count)
+
+    def record(self, order: Order, previous: Optional[Tuple[str, str]] = None):
+        """Apply a committed write; previous is the order's (status, payment_status) before it"""
+        current = (_value(order.status), _value(order.payment_status))
+        if previous is not None:
+            previous = (_value(previous[0]), _value(previous[1]))
+            if previous == current:
+                return
+            self._add(order.created_at, previous[0], previous[1], order.total_amount, -1)
+        self._add(order.created_at, current[0], current[1], order.total_amount, 1)
+
+    def day(self, day: date) -> StatsBucket:
+        return self.days.get(day) or StatsBucket()
+
+    def month(self, day: date) -> StatsBucket:
+        return self.months.get((day.year, day.month)) or StatsBucket()
+
+    async def rebuild(self, session):
+        """Recompute every counter from the orders table with one grouped query"""
+        day = func.date(Order.created_at)
+        result = await session.execute(
+            select(
+                day,
+                Order.status,
+                Order.payment_status,
+                func.count(Order.id),
+                func.coalesce(func.sum(Order.total_amount), 0)
+            ).group_by(day, Order.status, Order.payment_status)
+        )
+        self._reset()
+        for order_day, status, payment_status, count, amount in result.all():
+            order_day = _as_date(order_day)
+            created_at = datetime.combine(order_day, datetime.min.time())
+            for bucket in self._buckets(created_at):
+                bucket.orders += count
+                bucket.by_status[status] += count
+                bucket.by_payment[payment_status] += count
+                if payment_status == "paid":
+                    bucket.paid_revenue += amount
+
+order_counters = OrderCounters()
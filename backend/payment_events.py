@@ -0,0 +1,252 @@
+import asyncio
+import calendar
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from database import async_session_maker, PAYMENT_EVENT_BATCH_SIZE, PAYMENT_RECONCILE_INTERVAL_SECONDS
+from models import Order, PaymentEvent
+from payment_gateway import payment_gateway, PaymentGatewayError
+from payments import set_payment_status
+
+PAID_EVENTS = ("payment.captured", "order.paid")
+FAILED_EVENTS = ("payment.failed",)
+# Events for orders we can't find yet (e.g. the checkout commit is still in flight) are
+# retried every UNMATCHED_RETRY_DELAY, so they get about half a minute to show up
+MAX_UNMATCHED_ATTEMPTS = 5
+UNMATCHED_RETRY_DELAY = timedelta(seconds=5)
+# Orders younger than this are still in the browser checkout flow
+RECONCILE_GRACE = timedelta(minutes=10)
+RECONCILE_WINDOW = timedelta(hours=24)
+GATEWAY_PAGE_SIZE = 100
+
+def parse_webhook(body: Dict) -> Tuple[str, Optional[str], Optional[str]]:
+    """Extract (event type, payment id, gateway order id) from a Razorpay webhook body"""
+    payload = body.get("payload") or {}
+    payment = (payload.get("payment") or {}).get("entity") or {}
+    order = (payload.get("order") or {}).get("entity") or {}
+    return body.get("event", ""), payment.get("id"), payment.get("order_id") or order.get("id")
+
+async def enqueue_payment_event(
+    event_id: str,
+    event_type: str,
+    payment_id: Optional[str],
+    razorpay_order_id: Optional[str],
+    payload: Optional[Dict] = None
+) -> bool:
+    """Durably queue an event; returns False if this event id was already queued"""
+    async with async_session_maker() as session:
+        session.add(PaymentEvent(
+            event_id=event_id,
+            event_type=event_type,
+            payment_id=payment_id,
+            razorpay_order_id=razorpay_order_id,
+            payload=payload
+        ))
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Gateway redelivery of an event we already have
+            await session.rollback()
+            return False
+    return True
+
+# ===================== PAYMENT EVENT WORKER =====================
+
+# Awaited with an order and its (status, payment_status) before the worker changed it
+OrderCallback = Callable[[Order, Tuple[str, str]], Awaitable[None]]
+
+class PaymentEventWorker:
+    """
+    Applies queued payment events to orders in batched transactions and periodically
+    reconciles orders stuck in pending against the gateway, so payments land even when
+    the diner closes the tab before /api/payment/verify runs.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = PAYMENT_EVENT_BATCH_SIZE,
+        reconcile_interval: float = PAYMENT_RECONCILE_INTERVAL_SECONDS
+    ):
+        self.batch_size = max(1, batch_size)
+        self.reconcile_interval = reconcile_interval
+        self.on_paid: Optional[OrderCallback] = None
+        self.on_failed: Optional[OrderCallback] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_reconcile = 0.0
+
+    def start(self, on_paid: Optional[OrderCallback] = None, on_failed: Optional[OrderCallback] = None):
+        """Run the worker loop; the callbacks are awaited with (order, previous) for every order it marks paid/failed"""
+        self.on_paid = on_paid
+        self.on_failed = on_failed
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Process queued events now instead of at the next poll"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        self._last_reconcile = loop.time()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                # Keep going while full batches make progress; events left pending
+                # (unmatched orders) wait for their retry delay instead
+                while True:
+                    read, settled = await self.process_batch()
+                    if read < self.batch_size or not settled:
+                        break
+                if self.reconcile_interval and loop.time() - self._last_reconcile >= self.reconcile_interval:
+                    self._last_reconcile = loop.time()
+                    await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Payment event worker error: {e}")
+
+    async def process_batch(self) -> Tuple[int, int]:
+        """
+        Apply up to batch_size due events in one transaction. Returns how many events
+        were read and how many of them were settled (no longer pending).
+        """
+        now = datetime.utcnow()
+        paid: List[Tuple[Order, Tuple[str, str]]] = []
+        failed: List[Tuple[Order, Tuple[str, str]]] = []
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(PaymentEvent)
+                .where(
+                    PaymentEvent.status == "pending",
+                    or_(
+                        PaymentEvent.processed_at.is_(None),
+                        PaymentEvent.processed_at <= now - UNMATCHED_RETRY_DELAY
+                    )
+                )
+                .order_by(PaymentEvent.id)
+                .limit(self.batch_size)
+            )
+            events = result.scalars().all()
+            if not events:
+                return 0, 0
+
+            gateway_order_ids = {event.razorpay_order_id for event in events if event.razorpay_order_id}
+            orders: Dict[str, Order] = {}
+            if gateway_order_ids:
+                result = await session.execute(
+                    select(Order).where(Order.razorpay_order_id.in_(gateway_order_ids))
+                )
+                orders = {order.razorpay_order_id: order for order in result.scalars().all()}
+
+            seen_payments = set()
+            for event in events:
+                event.attempts = (event.attempts or 0) + 1
+                event.processed_at = now
+                order = orders.get(event.razorpay_order_id)
+                if event.event_type not in PAID_EVENTS + FAILED_EVENTS:
+                    event.status = "ignored"
+                elif order is None:
+                    if event.attempts >= MAX_UNMATCHED_ATTEMPTS:
+                        event.status = "unmatched"
+                elif event.payment_id in seen_payments or order.payment_status == "paid":
+                    # payment.captured and order.paid both arrive for one payment
+                    event.status = "duplicate"
+                elif event.event_type in PAID_EVENTS:
+                    # Conditional so a concurrent verify/worker can't apply the same payment twice
+                    previous = await set_payment_status(session, order, "paid", event.payment_id)
+                    if previous is not None:
+                        paid.append((order, previous))
+                        event.status = "applied"
+                    else:
+                        event.status = "duplicate"
+                    seen_payments.add(event.payment_id)
+                else:
+                    # A failed attempt only matters while the order is still unpaid
+                    previous = await set_payment_status(session, order, "failed", allowed_from=("pending",))
+                    if previous is not None:
+                        failed.append((order, previous))
+                    event.status = "applied"
+            await session.commit()
+
+        for callback, changed in ((self.on_paid, paid), (self.on_failed, failed)):
+            if callback is not None:
+                for order, previous in changed:
+                    await callback(order, previous)
+        settled = sum(1 for event in events if event.status != "pending")
+        return len(events), settled
+
+    async def reconcile(self) -> int:
+        """
+        Queue captured payments for orders stuck in pending. One paginated payments
+        listing covers every stuck order in the window instead of a call per order.
+        """
+        now = datetime.utcnow()
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(Order.razorpay_order_id).where(
+                    Order.payment_status == "pending",
+                    Order.razorpay_order_id.isnot(None),
+                    Order.created_at >= now - RECONCILE_WINDOW,
+                    Order.created_at <= now - RECONCILE_GRACE
+                )
+            )
+            stuck = set(result.scalars().all())
+        if not stuck:
+            return 0
+
+        queued = 0
+        skip = 0
+        since = calendar.timegm((now - RECONCILE_WINDOW).utctimetuple())
+        try:
+            while True:
+                page = await payment_gateway.list_payments({"from": since, "count": GATEWAY_PAGE_SIZE, "skip": skip})
+                items = page.get("items", [])
+                for payment in items:
+                    if payment.get("order_id") in stuck and payment.get("status") == "captured":
+                        if await enqueue_payment_event(
+                            f"reconcile:{payment['id']}", "payment.captured",
+                            payment["id"], payment["order_id"], {"payment": payment}
+                        ):
+                            queued += 1
+                if len(items) < GATEWAY_PAGE_SIZE:
+                    break
+                skip += GATEWAY_PAGE_SIZE
+        except PaymentGatewayError as e:
+            print(f"Payment reconciliation skipped: {e}")
+        if queued:
+            await self.process_batch()
+        return queued
+
+    async def purge_processed(self, days: int = 30) -> int:
+        """Delete handled events older than `days` days"""
+        async with async_session_maker() as session:
+            result = await session.execute(
+                delete(PaymentEvent).where(
+                    PaymentEvent.status != "pending",
+                    PaymentEvent.created_at < datetime.utcnow() - timedelta(days=days)
+                )
+            )
+            await session.commit()
+            return result.rowcount or 0
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+payment_event_worker = PaymentEventWorker()
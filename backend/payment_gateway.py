@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import razorpay
+import requests
+from requests.adapters import HTTPAdapter
+
+from database import (
+    RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET, RAZORPAY_BASE_URL,
+    PAYMENT_GATEWAY_TIMEOUT_SECONDS, PAYMENT_GATEWAY_MAX_WORKERS,
+    PAYMENT_BREAKER_FAILURES, PAYMENT_BREAKER_RESET_SECONDS
+)
+
+class PaymentGatewayError(Exception):
+    """The gateway rejected a request or could not be reached"""
+
+class GatewayUnavailable(PaymentGatewayError):
+    """The gateway is timing out or failing; calls are being short-circuited"""
+
+# ===================== CIRCUIT BREAKER =====================
+
+class CircuitBreaker:
+    """
+    Opens after max_failures consecutive gateway failures and fails fast until
+    reset_seconds have passed; then lets a single trial call through (half-open)
+    and closes again if it succeeds.
+    """
+
+    def __init__(self, max_failures: int = PAYMENT_BREAKER_FAILURES, reset_seconds: float = PAYMENT_BREAKER_RESET_SECONDS):
+        self.max_failures = max(1, max_failures)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """
+        Raise GatewayUnavailable instead of calling a gateway known to be down.
+        Returns True if this call is the half-open trial.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return False
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            raise GatewayUnavailable("Payment gateway is temporarily unavailable")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Give up a half-open trial that ended without an answer (e.g. cancelled)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.max_failures:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+# ===================== RAZORPAY ADAPTER =====================
+
+class TimeoutSession(requests.Session):
+    """requests session that applies a default (connect, read) timeout to every call"""
+
+    def __init__(self, timeout: float, pool_size: int):
+        super().__init__()
+        self.timeout = (min(timeout, 3.05), timeout)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(*args, **kwargs)
+
+def _is_gateway_fault(error: Exception) -> bool:
+    # Client errors (bad amount, unknown id) don't say anything about gateway health
+    return isinstance(error, (
+        requests.exceptions.RequestException,
+        razorpay.errors.ServerError,
+        razorpay.errors.GatewayError,
+        ValueError,  # non-JSON error page from a proxy in front of the gateway
+    ))
+
+class PaymentGateway:
+    """
+    Async facade over the synchronous Razorpay SDK. Calls run on a small bounded thread
+    pool sharing one keep-alive connection pool, with strict timeouts and a circuit
+    breaker, so a slow gateway never blocks the event loop or piles up requests.
+    """
+
+    def __init__(
+        self,
+        key_id: str = RAZORPAY_KEY_ID,
+        key_secret: str = RAZORPAY_KEY_SECRET,
+        base_url: Optional[str] = RAZORPAY_BASE_URL,
+        timeout: float = PAYMENT_GATEWAY_TIMEOUT_SECONDS,
+        max_workers: int = PAYMENT_GATEWAY_MAX_WORKERS,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.key_id = key_id
+        self.max_workers = max(1, max_workers)
+        self.session = TimeoutSession(timeout, self.max_workers)
+        options = {"base_url": base_url} if base_url else {}
+        self.client = razorpay.Client(session=self.session, auth=(key_id, key_secret), **options)
+        self.breaker = breaker or CircuitBreaker()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="razorpay")
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+    async def _call(self, func: Callable, *args):
+        trial = self.breaker.before_call()
+        try:
+            self._ensure_executor()
+            # Wait for a worker here (cancellable) rather than in the executor's queue
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                try:
+                    result = await loop.run_in_executor(self._executor, func, *args)
+                except Exception as e:
+                    if _is_gateway_fault(e):
+                        self.breaker.record_failure()
+                        raise GatewayUnavailable(f"Payment gateway error: {e}") from e
+                    self.breaker.record_success()
+                    raise PaymentGatewayError(str(e)) from e
+            self.breaker.record_success()
+            return result
+        finally:
+            # No-op once the outcome was recorded; frees a trial that was cancelled
+            if trial:
+                self.breaker.release_trial()
+
+    async def create_order(self, data: Dict) -> Dict:
+        return await self._call(self.client.order.create, data)
+
+    async def fetch_order(self, razorpay_order_id: str) -> Dict:
+        return await self._call(self.client.order.fetch, razorpay_order_id)
+
+    async def fetch_order_payments(self, razorpay_order_id: str) -> Dict:
+        return await self._call(self.client.order.payments, razorpay_order_id)
+
+    async def list_orders(self, params: Dict) -> Dict:
+        return await self._call(self.client.order.all, params)
+
+    async def list_payments(self, params: Dict) -> Dict:
+        return await self._call(self.client.payment.all, params)
+
+    def verify_payment_signature(self, params: Dict):
+        """Local HMAC check (no network call); raises SignatureVerificationError"""
+        self.client.utility.verify_payment_signature(params)
+
+    def verify_webhook_signature(self, body: str, signature: str, secret: str):
+        """Local HMAC check of a webhook body; raises SignatureVerificationError"""
+        self.client.utility.verify_webhook_signature(body, signature, secret)
+
+    def close(self):
+        """Release worker threads and pooled connections"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._slots = None
+        self.session.close()
+
+payment_gateway = PaymentGateway()
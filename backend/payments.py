@@ -0,0 +1,115 @@
+import asyncio
+import calendar
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import async_session_maker, create_tables
+from models import Order
+from payment_gateway import payment_gateway
+
+GATEWAY_PAGE_SIZE = 100
+
+async def find_order_for_payment(db: AsyncSession, razorpay_order_id: str) -> Optional[Order]:
+    """Resolve a gateway order id to our order with one indexed lookup"""
+    result = await db.execute(select(Order).where(Order.razorpay_order_id == razorpay_order_id))
+    return result.scalar_one_or_none()
+
+async def set_payment_status(
+    db: AsyncSession,
+    order: Order,
+    payment_status: str,
+    payment_id: Optional[str] = None,
+    allowed_from: Tuple[str, ...] = ("pending", "failed")
+) -> Optional[Tuple[str, str]]:
+    """
+    Move an order's payment_status with a conditional UPDATE pinned to the value we
+    last read, so concurrent verify calls and the webhook worker can't both apply one
+    payment. Returns the order's previous (status, payment_status) if this call made
+    the change, or None if the order was already moved elsewhere. Caller commits.
+    """
+    values = {"payment_status": payment_status}
+    if payment_id is not None:
+        values["payment_id"] = payment_id
+    # A lost race re-reads once; a second loss means someone else settled it
+    for _ in range(2):
+        observed = order.payment_status
+        if observed not in allowed_from:
+            return None
+        result = await db.execute(
+            update(Order)
+            .where(Order.id == order.id, Order.payment_status == observed)
+            .values(**values)
+            .returning(Order.status)
+            .execution_options(synchronize_session="fetch")
+        )
+        status = result.scalar_one_or_none()
+        if status is not None:
+            return (status, observed)
+        await db.refresh(order)
+    return None
+
+# ===================== RAZORPAY ORDER ID BACKFILL =====================
+
+async def backfill_razorpay_order_ids(days: int = 7) -> int:
+    """
+    Link pending orders from the last `days` days to their gateway orders. Gateway
+    orders are listed in bulk for the window and matched on receipt (our order number);
+    the most recent gateway order wins when a checkout was retried.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(Order.id, Order.order_number).where(
+                Order.payment_status == "pending",
+                Order.razorpay_order_id.is_(None),
+                Order.created_at >= since
+            )
+        )
+        pending = {order_number: order_id for order_id, order_number in result.all()}
+    if not pending:
+        return 0
+
+    matches: Dict[str, Dict] = {}
+    skip = 0
+    while True:
+        page = await payment_gateway.list_orders({
+            "from": calendar.timegm(since.utctimetuple()),
+            "count": GATEWAY_PAGE_SIZE,
+            "skip": skip
+        })
+        items = page.get("items", [])
+        for gateway_order in items:
+            receipt = gateway_order.get("receipt")
+            if receipt not in pending:
+                continue
+            current = matches.get(receipt)
+            if current is None or gateway_order.get("created_at", 0) > current.get("created_at", 0):
+                matches[receipt] = gateway_order
+        if len(items) < GATEWAY_PAGE_SIZE:
+            break
+        skip += GATEWAY_PAGE_SIZE
+
+    async with async_session_maker() as session:
+        for receipt, gateway_order in matches.items():
+            await session.execute(
+                update(Order)
+                .where(Order.id == pending[receipt], Order.razorpay_order_id.is_(None))
+                .values(razorpay_order_id=gateway_order["id"])
+            )
+        await session.commit()
+    return len(matches)
+
+async def main(days: int = 7):
+    await create_tables()
+    total = await backfill_razorpay_order_ids(days)
+    print(f"Done - linked {total} pending orders to their Razorpay orders")
+    payment_gateway.close()
+
+if __name__ == "__main__":
+    # One-off after upgrading: python payments.py [days]
+    import sys
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 7))
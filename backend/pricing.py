@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional, Tuple
+
+from models import CartItem, Discount
+
+# ===================== PRICE TABLE =====================
+
+class PricingError(ValueError):
+    """Raised when cart lines cannot be priced; carries one message per rejected line"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+class PortionUnavailable(LookupError):
+    """The item exists but has no price for the requested portion"""
+
+    def __init__(self, item: Dict, portion: Optional[str]):
+        super().__init__(f"{item['name']} is not available as a {portion} portion")
+        self.item = item
+        self.portion = portion
+
+class PriceTable:
+    """Server-side prices keyed by (menu_item_id, half_full), built once per menu snapshot"""
+
+    def __init__(self, items: List[Dict]):
+        self.prices: Dict[Tuple[int, Optional[str]], float] = {}
+        self.items: Dict[int, Dict] = {}
+        for item in items:
+            item_id = item["id"]
+            self.items[item_id] = item
+            single = item["price"] if item["price"] is not None else item["price_full"]
+            full = item["price_full"] if item["price_full"] is not None else item["price"]
+            if single is not None:
+                self.prices[(item_id, None)] = single
+            if full is not None:
+                self.prices[(item_id, "full")] = full
+            if item["price_half"] is not None:
+                self.prices[(item_id, "half")] = item["price_half"]
+
+    def resolve(self, menu_item_id: int, half_full: Optional[str]) -> Tuple[Dict, float]:
+        """
+        Look up a cart line in O(1); raises KeyError for unknown items and
+        PortionUnavailable when the item isn't priced for the requested portion
+        """
+        item = self.items[menu_item_id]
+        portion = half_full.lower() if half_full else None
+        if not item["has_half_full"]:
+            portion = None
+        elif portion is None:
+            portion = "full"
+        price = self.prices.get((menu_item_id, portion))
+        if price is None:
+            raise PortionUnavailable(item, portion or "single")
+        return item, price
+
+# ===================== ORDER PRICING =====================
+
+class PricedOrder:
+    """Authoritative totals and line items for an order"""
+
+    def __init__(self, lines: List[Dict], subtotal: float, discount_amount: float,
+                 tax_amount: float, total_amount: float):
+        self.lines = lines
+        self.subtotal = subtotal
+        self.discount_amount = discount_amount
+        self.tax_amount = tax_amount
+        self.total_amount = total_amount
+
+def calculate_discount(discount: Optional[Discount], subtotal: float) -> float:
+    """Discount amount for a subtotal (0 when the code doesn't apply)"""
+    if not discount or not discount.is_active or subtotal < discount.min_order_amount:
+        return 0
+    if discount.discount_type == "percentage":
+        amount = min(
+            subtotal * (discount.discount_value / 100),
+            discount.max_discount or float('inf')
+        )
+    else:
+        amount = discount.discount_value
+    return round(min(amount, subtotal), 2)
+
+def price_order(
+    price_table: PriceTable,
+    cart: List[CartItem],
+    discount: Optional[Discount],
+    gst_rate: float
+) -> PricedOrder:
+    """Resolve every cart line against the price table and compute totals in one pass"""
+    lines = []
+    errors = []
+    subtotal = 0
+    for index, cart_item in enumerate(cart, start=1):
+        try:
+            item, price = price_table.resolve(cart_item.menu_item_id, cart_item.half_full)
+        except PortionUnavailable as e:
+            errors.append(f"Item {index} ({cart_item.name}): {e}")
+            continue
+        except KeyError:
+            errors.append(f"Item {index} ({cart_item.name}) is not on the menu")
+            continue
+        if not item["is_available"]:
+            errors.append(f"{item['name']} is currently unavailable")
+            continue
+        if cart_item.quantity < 1:
+            errors.append(f"{item['name']} has an invalid quantity")
+            continue
+        subtotal += price * cart_item.quantity
+        lines.append({
+            "menu_item_id": item["id"],
+            "name": item["name"],
+            "price": price,
+            "quantity": cart_item.quantity,
+            "half_full": cart_item.half_full,
+            "notes": cart_item.notes
+        })
+    if errors:
+        raise PricingError(errors)
+    if not lines:
+        raise PricingError(["Order has no items"])
+
+    subtotal = round(subtotal, 2)
+    discount_amount = calculate_discount(discount, subtotal)
+    taxable_amount = subtotal - discount_amount
+    tax_amount = round(taxable_amount * (gst_rate / 100), 2)
+    total_amount = round(taxable_amount + tax_amount, 2)
+    return PricedOrder(lines, subtotal, discount_amount, tax_amount, total_amount)
@@ -4,35 +4,54 @@ import io as csv_io
 import qrcode
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import func, distinct
 
 from database import get_db, FRONTEND_URL
 from models import (
     Table, TableCreate, TableResponse,
     Discount, DiscountCreate, DiscountResponse,
-    Order, MenuItem, User, UserLogin, TokenResponse
+    Order, OrderItem, MenuItem, User, UserLogin, TokenResponse
 )
-from auth import verify_password, create_access_token, get_current_user
+from auth import (
+    create_access_token, get_current_user,
+    login_throttle, needs_rehash, password_hasher
+)
+from order_stats import order_counters
+from discounts import discount_engine
+from backplane import backplane
+from pricing import calculate_discount
 
 router = APIRouter()
 
 # ===================== LOGIN API =====================
 
 @router.post("/api/admin/login", response_model=TokenResponse)
-async def admin_login(login_data: UserLogin, db: AsyncSession = Depends(get_db)):
+async def admin_login(login_data: UserLogin, request: Request, db: AsyncSession = Depends(get_db)):
     """Admin/staff login to obtain JWT token"""
-    result = await db.execute(select(User).where(User.username == login_data.username))
-    user = result.scalar_one_or_none()
+    client_ip = request.client.host if request.client else None
+    login_throttle.acquire(login_data.username, client_ip)
+    try:
+        result = await db.execute(select(User).where(User.username == login_data.username))
+        user = result.scalar_one_or_none()
+        # End the read so the pooled connection isn't held while logins queue for bcrypt
+        await db.commit()
+        
+        # bcrypt runs on the hasher's thread pool, off the event loop
+        verified = await password_hasher.verify(login_data.password, user.hashed_password if user else None)
+    finally:
+        login_throttle.release(login_data.username, client_ip)
     
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not verified:
+        login_throttle.record_failure(login_data.username, client_ip)
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password"
         )
+    login_throttle.reset(login_data.username)
         
     if not user.is_active:
         raise HTTPException(
@@ -40,6 +59,11 @@ async def admin_login(login_data: UserLogin, db: AsyncSession = Depends(get_db))
             detail="Inactive user account"
         )
         
+    # Upgrade hashes made with an older BCRYPT_ROUNDS while we have the plaintext
+    if needs_rehash(user.hashed_password, password_hasher.rounds):
+        user.hashed_password = await password_hasher.hash(login_data.password)
+        await db.commit()
+    
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -150,40 +174,30 @@ async def create_discount(
     db.add(db_discount)
     await db.commit()
     await db.refresh(db_discount)
+    discount_engine.invalidate()
+    backplane.publish("discounts", {})
     return db_discount
 
 @router.post("/api/discounts/validate")
 async def validate_discount(code: str, order_amount: float, db: AsyncSession = Depends(get_db)):
-    """Validate discount code"""
-    result = await db.execute(select(Discount).where(Discount.code == code))
-    discount = result.scalar_one_or_none()
+    """Validate discount code against the cached active codes"""
+    discount = await discount_engine.get(db, code)
     
-    if not discount or not discount.is_active:
+    if not discount:
         raise HTTPException(status_code=404, detail="Invalid or expired discount code")
     
-    if discount.valid_until and discount.valid_until < datetime.utcnow():
-        raise HTTPException(status_code=400, detail="Discount code has expired")
-    
-    if discount.usage_limit and discount.usage_count >= discount.usage_limit:
-        raise HTTPException(status_code=400, detail="Discount code usage limit reached")
+    reason = discount.unavailable_reason()
+    if reason:
+        raise HTTPException(status_code=400, detail=reason)
     
     if order_amount < discount.min_order_amount:
         raise HTTPException(status_code=400, detail=f"Minimum order amount ₹{discount.min_order_amount} required")
     
-    # Calculate discount
-    if discount.discount_type == "percentage":
-        discount_amount = min(
-            order_amount * (discount.discount_value / 100),
-            discount.max_discount or float('inf')
-        )
-    else:
-        discount_amount = discount.discount_value
-    
     return {
         "valid": True,
         "code": discount.code,
         "name": discount.name,
-        "discount_amount": round(discount_amount, 2)
+        "discount_amount": calculate_discount(discount, order_amount)
     }
 
 @router.delete("/api/discounts/{discount_id}")
@@ -200,8 +214,23 @@ async def delete_discount(
     
     db_discount.is_active = False
     await db.commit()
+    discount_engine.invalidate()
+    backplane.publish("discounts", {})
     return {"message": "Discount deleted"}
 
+# ===================== REPORT HELPERS =====================
+
+def paid_items_query(query, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Restrict an order_items query to paid orders, filtering on the indexed item timestamp"""
+    query = query.select_from(OrderItem).join(Order, Order.id == OrderItem.order_id).where(
+        Order.payment_status == "paid"
+    )
+    if start:
+        query = query.where(OrderItem.created_at >= start)
+    if end:
+        query = query.where(OrderItem.created_at <= end)
+    return query
+
 # ===================== ADMIN APIs =====================
 
 @router.get("/api/admin/stats")
@@ -210,49 +239,36 @@ async def get_admin_stats(
     current_user: User = Depends(get_current_user)
 ):
     """Get real-time admin statistics"""
+    # Order figures come from the incrementally maintained counters
     today = datetime.utcnow().date()
-    today_start = datetime.combine(today, datetime.min.time())
-    
-    # Today's orders
-    result = await db.execute(
-        select(Order).where(Order.created_at >= today_start)
-    )
-    today_orders = result.scalars().all()
-    
-    today_revenue = sum(o.total_amount for o in today_orders if o.payment_status == "paid")
-    today_orders_count = sum(1 for o in today_orders if o.payment_status == "paid")
-    pending_orders = sum(1 for o in today_orders if o.status == "pending")
-    preparing_orders = sum(1 for o in today_orders if o.status == "preparing")
-    
-    # This month
-    month_start = today.replace(day=1)
-    month_result = await db.execute(
-        select(Order).where(Order.created_at >= month_start)
-    )
-    month_orders = month_result.scalars().all()
-    month_revenue = sum(o.total_amount for o in month_orders if o.payment_status == "paid")
-    
-    # All time stats
-    all_orders = await db.execute(select(Order))
-    all_orders_list = all_orders.scalars().all()
-    all_time_revenue = sum(o.total_amount for o in all_orders_list if o.payment_status == "paid")
-    all_time_orders = sum(1 for o in all_orders_list if o.payment_status == "paid")
+    today_stats = order_counters.day(today)
+    month_stats = order_counters.month(today)
+    all_time = order_counters.all_time
     
     # Menu items count
     menu_count = await db.execute(select(func.count()).select_from(MenuItem))
     menu_items_count = menu_count.scalar_one()
     
     return {
-        "today_revenue": today_revenue,
-        "today_orders": today_orders_count,
-        "pending_orders": pending_orders,
-        "preparing_orders": preparing_orders,
-        "month_revenue": month_revenue,
-        "all_time_revenue": all_time_revenue,
-        "all_time_orders": all_time_orders,
+        "today_revenue": today_stats.revenue,
+        "today_orders": today_stats.paid_orders,
+        "pending_orders": today_stats.by_status["pending"],
+        "preparing_orders": today_stats.by_status["preparing"],
+        "month_revenue": month_stats.revenue,
+        "all_time_revenue": all_time.revenue,
+        "all_time_orders": all_time.paid_orders,
         "menu_items_count": menu_items_count
     }
 
+@router.post("/api/admin/stats/rebuild")
+async def rebuild_admin_stats(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Recompute the order counters from the orders table"""
+    await order_counters.rebuild(db)
+    return {"message": "Order statistics rebuilt", "all_time_orders": order_counters.all_time.orders}
+
 @router.get("/api/admin/sales")
 async def get_sales_report(
     start_date: Optional[str] = None,
@@ -262,6 +278,7 @@ async def get_sales_report(
 ):
     """Get sales report"""
     query = select(Order).where(Order.payment_status == "paid")
+    start = end = None
     
     if start_date:
         start = datetime.strptime(start_date, "%Y-%m-%d")
@@ -285,37 +302,34 @@ async def get_sales_report(
         daily_sales[date_key]["orders"] += 1
         daily_sales[date_key]["revenue"] += order.total_amount
     
-    # Item breakdown
-    item_counts = {}
-    for order in orders:
-        for item in order.items_json:
-            name = item["name"]
-            if name in item_counts:
-                item_counts[name]["quantity"] += item["quantity"]
-                item_counts[name]["revenue"] += item["price"] * item["quantity"]
-            else:
-                item_counts[name] = {
-                    "quantity": item["quantity"],
-                    "revenue": item["price"] * item["quantity"]
-                }
-    
-    # Category breakdown
-    category_sales = {}
-    category_items = await db.execute(select(MenuItem))
-    category_map = {item.id: item.category_id for item in category_items.scalars().all()}
+    # Item breakdown - aggregated in SQL over order_items
+    item_revenue = func.sum(OrderItem.price * OrderItem.quantity)
+    item_query = paid_items_query(
+        select(OrderItem.name, func.sum(OrderItem.quantity), item_revenue), start, end
+    ).group_by(OrderItem.name).order_by(item_revenue.desc())
+    item_result = await db.execute(item_query)
+    item_counts = {
+        name: {"quantity": quantity, "revenue": revenue}
+        for name, quantity, revenue in item_result.all()
+    }
     
-    for order in orders:
-        for item in order.items_json:
-            cat_id = category_map.get(item["menu_item_id"], "unknown")
-            if cat_id not in category_sales:
-                category_sales[cat_id] = {"orders": 0, "revenue": 0}
-            category_sales[cat_id]["revenue"] += item["price"] * item["quantity"]
+    # Category breakdown - order_items joined to the menu for category ids
+    category_query = paid_items_query(
+        select(MenuItem.category_id, func.count(distinct(OrderItem.order_id)), item_revenue)
+        .outerjoin(MenuItem, MenuItem.id == OrderItem.menu_item_id),
+        start, end
+    ).group_by(MenuItem.category_id)
+    category_result = await db.execute(category_query)
+    category_sales = {
+        cat_id if cat_id is not None else "unknown": {"orders": order_count, "revenue": revenue}
+        for cat_id, order_count, revenue in category_result.all()
+    }
     
     return {
         "total_revenue": total_revenue,
         "total_orders": total_orders,
         "daily_sales": daily_sales,
-        "items_sold": dict(sorted(item_counts.items(), key=lambda x: x[1]["revenue"], reverse=True)),
+        "items_sold": item_counts,
         "category_sales": category_sales
     }
 
@@ -359,17 +373,15 @@ async def get_analytics(
         period_data[key]["orders"] += 1
         period_data[key]["revenue"] += order.total_amount
     
-    # Top items
-    item_counts = {}
-    for order in orders:
-        for item in order.items_json:
-            name = item["name"]
-            if name in item_counts:
-                item_counts[name] += item["quantity"]
-            else:
-                item_counts[name] = item["quantity"]
-    
-    top_items = sorted(item_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    # Top items - indexed aggregate over order_items
+    quantity_sold = func.sum(OrderItem.quantity)
+    top_items_result = await db.execute(
+        paid_items_query(select(OrderItem.name, quantity_sold), start_date)
+        .group_by(OrderItem.name)
+        .order_by(quantity_sold.desc())
+        .limit(10)
+    )
+    top_items = [tuple(row) for row in top_items_result.all()]
     
     return {
         "period": period,
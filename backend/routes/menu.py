@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func
@@ -6,8 +7,17 @@ from typing import List, Optional
 from database import get_db
 from models import (
     Category, CategoryCreate, CategoryResponse,
-    MenuItem, MenuItemCreate, MenuItemResponse
+    MenuItem, MenuItemCreate, MenuItemResponse, MenuImportResult, MenuChange, User
 )
+from menu_cache import menu_cache, etag_matches
+from menu_changes import (
+    record_menu_change, publish_menu_changes, get_menu_changes, item_payload, category_payload,
+    MAX_DELTA_CHANGES
+)
+from menu_import import MenuImportError, parse_menu_csv, parse_menu_json, upsert_menu
+from search_index import menu_search_index
+from auth import get_current_user
+from backplane import backplane
 
 router = APIRouter()
 
@@ -55,6 +65,15 @@ def get_default_menu():
         {"name": "Mineral Water (500ml)", "description": "Packaged drinking water", "price": 20, "category": "beverages", "subcategory": "water", "is_vegetarian": True, "has_half_full": False, "preparation_time": 2},
     ]
 
+# ===================== CHANGE PUBLISHING =====================
+
+async def commit_menu_changes(db: AsyncSession, changes: List[MenuChange]):
+    """Commit a menu mutation with its change records, then refresh caches and notify clients"""
+    await db.commit()
+    menu_cache.invalidate()
+    backplane.publish("menu", {})
+    await publish_menu_changes(changes)
+
 # ===================== CATEGORY APIs =====================
 
 @router.get("/api/categories", response_model=List[CategoryResponse])
@@ -70,7 +89,9 @@ async def create_category(category: CategoryCreate, db: AsyncSession = Depends(g
     """Create new category"""
     db_category = Category(**category.dict())
     db.add(db_category)
-    await db.commit()
+    await db.flush()
+    change = await record_menu_change(db, "category", "created", db_category.id, category_payload(db_category))
+    await commit_menu_changes(db, [change])
     await db.refresh(db_category)
     return db_category
 
@@ -85,7 +106,8 @@ async def update_category(category_id: int, category: CategoryCreate, db: AsyncS
     for key, value in category.dict().items():
         setattr(db_category, key, value)
     
-    await db.commit()
+    change = await record_menu_change(db, "category", "updated", db_category.id, category_payload(db_category))
+    await commit_menu_changes(db, [change])
     await db.refresh(db_category)
     return db_category
 
@@ -98,47 +120,81 @@ async def delete_category(category_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Category not found")
     
     db_category.is_active = False
-    await db.commit()
+    change = await record_menu_change(db, "category", "deleted", db_category.id)
+    await commit_menu_changes(db, [change])
     return {"message": "Category deleted"}
 
 # ===================== MENU APIs =====================
 
 @router.get("/api/menu", response_model=List[MenuItemResponse])
 async def get_menu(
+    request: Request,
     category: Optional[str] = None,
     subcategory: Optional[str] = None,
     is_vegetarian: Optional[bool] = None,
     search: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all menu items with optional filters"""
-    query = select(MenuItem).where(MenuItem.is_available == True)
+    """Get all menu items with optional filters (served from the menu snapshot)"""
+    snapshot = await menu_cache.get_snapshot(db)
+    variant = snapshot.view(category, subcategory, is_vegetarian)
     
-    if category and category != 'undefined':
-        # Try to filter by category_id first (if numeric)
-        try:
-            category_id = int(category)
-            query = query.where(MenuItem.category_id == category_id)
-        except ValueError:
-            # If not numeric, filter by category name (join with categories table)
-            cat_result = await db.execute(select(Category).where(Category.name == category))
-            cat = cat_result.scalar_one_or_none()
-            if cat:
-                query = query.where(MenuItem.category_id == cat.id)
-            else:
-                # If category not found, return empty list
-                return []
-    
-    if subcategory and subcategory != 'undefined':
-        query = query.where(MenuItem.subcategory == subcategory)
-    if is_vegetarian is not None:
-        query = query.where(MenuItem.is_vegetarian == is_vegetarian)
     if search:
-        query = query.where(MenuItem.name.contains(search))
+        allowed_ids = {item["id"] for item in variant.items}
+        return [
+            snapshot.items_by_id[item_id]
+            for item_id, _ in search_menu_snapshot(snapshot, search)
+            if item_id in allowed_ids
+        ]
     
-    result = await db.execute(query)
-    items = result.scalars().all()
-    return items
+    # Pre-encoded bytes are written as-is; no per-request validation or JSON encoding
+    body, encoding, etag = variant.representation(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        "X-Menu-Revision": str(snapshot.revision)
+    }
+    if etag_matches(request.headers.get("if-none-match"), variant.etags):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def search_menu_snapshot(snapshot, query: str, limit: Optional[int] = None):
+    """Rank available items of a snapshot against a query via the search index"""
+    menu_search_index.sync(snapshot.version, snapshot.available_items)
+    return menu_search_index.search(query, limit)
+
+@router.get("/api/menu/search", response_model=List[MenuItemResponse])
+async def search_menu(
+    q: str = Query(..., min_length=1, max_length=100),
+    is_vegetarian: Optional[bool] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Ranked, typo-tolerant, prefix-as-you-type menu search over name, description and subcategory"""
+    snapshot = await menu_cache.get_snapshot(db)
+    results = []
+    for item_id, _ in search_menu_snapshot(snapshot, q):
+        item = snapshot.items_by_id[item_id]
+        if is_vegetarian is not None and item["is_vegetarian"] != is_vegetarian:
+            continue
+        results.append(item)
+        if len(results) >= limit:
+            break
+    return results
+
+@router.get("/api/menu/changes")
+async def get_menu_changes_since(
+    since: int = Query(default=0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Menu delta feed: latest state of every item/category changed after revision 'since'.
+    'resync' is true when the client must refetch /api/menu (unknown or too old revision, bulk reset).
+    """
+    return await get_menu_changes(db, since)
 
 @router.get("/api/menu/{item_id}", response_model=MenuItemResponse)
 async def get_menu_item(item_id: int, db: AsyncSession = Depends(get_db)):
@@ -154,7 +210,9 @@ async def create_menu_item(item: MenuItemCreate, db: AsyncSession = Depends(get_
     """Create new menu item"""
     db_item = MenuItem(**item.dict())
     db.add(db_item)
-    await db.commit()
+    await db.flush()
+    change = await record_menu_change(db, "item", "created", db_item.id, item_payload(db_item))
+    await commit_menu_changes(db, [change])
     await db.refresh(db_item)
     return db_item
 
@@ -171,7 +229,8 @@ async def update_menu_item(item_id: int, item: MenuItemCreate, db: AsyncSession
     from datetime import datetime
     db_item.updated_at = datetime.utcnow()
     
-    await db.commit()
+    change = await record_menu_change(db, "item", "updated", db_item.id, item_payload(db_item))
+    await commit_menu_changes(db, [change])
     await db.refresh(db_item)
     return db_item
 
@@ -184,7 +243,8 @@ async def delete_menu_item(item_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Menu item not found")
     
     await db.delete(db_item)
-    await db.commit()
+    change = await record_menu_change(db, "item", "deleted", item_id)
+    await commit_menu_changes(db, [change])
     return {"message": "Menu item deleted"}
 
 @router.put("/api/menu/{item_id}/toggle-availability")
@@ -196,9 +256,58 @@ async def toggle_availability(item_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Menu item not found")
     
     db_item.is_available = not db_item.is_available
-    await db.commit()
+    change = await record_menu_change(db, "item", "toggled", db_item.id, item_payload(db_item))
+    await commit_menu_changes(db, [change])
     return {"message": "Availability updated", "is_available": db_item.is_available}
 
+# ===================== BULK IMPORT =====================
+
+@router.post("/api/menu/import", response_model=MenuImportResult)
+async def import_menu(
+    request: Request,
+    format: Optional[str] = Query(default=None, pattern="^(csv|json)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Bulk upsert menu items from a CSV or JSON body in a single transaction.
+    Items are matched on 'key' (derived from the name when omitted); categories are
+    referenced by name and created as needed. Each written item and category gets its
+    own change record, unless there are too many for a delta to beat a full refetch.
+    """
+    body = (await request.body()).decode("utf-8-sig")
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "json"
+    
+    try:
+        rows = parse_menu_csv(body) if format == "csv" else parse_menu_json(body)
+        summary = await upsert_menu(db, rows)
+    except MenuImportError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    written = summary.pop("changes")
+    changes = []
+    if len(written) > MAX_DELTA_CHANGES:
+        changes.append(await record_menu_change(db, "menu", "reset"))
+    elif written:
+        # Bulk statements bypass the identity map, so reload what they wrote
+        category_ids = [entity_id for entity, _, entity_id in written if entity == "category"]
+        item_ids = [entity_id for entity, _, entity_id in written if entity == "item"]
+        result = await db.execute(
+            select(Category).where(Category.id.in_(category_ids)).execution_options(populate_existing=True)
+        )
+        categories = {category.id: category for category in result.scalars().all()}
+        result = await db.execute(
+            select(MenuItem).where(MenuItem.id.in_(item_ids)).execution_options(populate_existing=True)
+        )
+        items = {item.id: item for item in result.scalars().all()}
+        for entity, action, entity_id in written:
+            payload = category_payload(categories[entity_id]) if entity == "category" else item_payload(items[entity_id])
+            changes.append(await record_menu_change(db, entity, action, entity_id, payload))
+    await commit_menu_changes(db, changes)
+    return summary
+
 # ===================== SINGLE MENU SEED ENDPOINT =====================
 
 @router.post("/api/menu/seed")
@@ -214,25 +323,9 @@ async def seed_menu(db: AsyncSession = Depends(get_db)):
     if existing_count == 0:
         # Seed menu if empty
         menu_items_data = get_default_menu()
-        
-        for item_data in menu_items_data:
-            # Find category
-            item_data_copy = item_data.copy()
-            cat_name = item_data_copy.pop("category", "default")
-            cat_result = await db.execute(select(Category).where(Category.name == cat_name))
-            category = cat_result.scalar_one_or_none()
-            
-            if not category:
-                category = Category(name=cat_name)
-                db.add(category)
-                await db.commit()
-                await db.refresh(category)
-            
-            item_data_copy["category_id"] = category.id
-            db_item = MenuItem(**item_data_copy)
-            db.add(db_item)
-        
-        await db.commit()
+        await upsert_menu(db, menu_items_data)
+        change = await record_menu_change(db, "menu", "reset")
+        await commit_menu_changes(db, [change])
         return {"message": f"Menu seeded successfully with {len(menu_items_data)} items", "items_count": len(menu_items_data)}
     else:
         return {
@@ -246,34 +339,13 @@ async def reset_menu(db: AsyncSession = Depends(get_db)):
     """Force reset menu - deletes all items and categories and reseeds"""
     from sqlalchemy import text
     
-    # Delete existing menu items
+    # Delete existing menu items and categories; the reseed commits in the same transaction
     await db.execute(text("DELETE FROM menu_items"))
-    await db.commit()
-    
-    # Delete existing categories
     await db.execute(text("DELETE FROM categories"))
-    await db.commit()
     
     # Seed fresh menu
     menu_items_data = get_default_menu()
-    
-    for item_data in menu_items_data:
-        item_data_copy = item_data.copy()
-        cat_name = item_data_copy.pop("category", "default")
-        
-        # Create category
-        cat_result = await db.execute(select(Category).where(Category.name == cat_name))
-        category = cat_result.scalar_one_or_none()
-        
-        if not category:
-            category = Category(name=cat_name)
-            db.add(category)
-            await db.commit()
-            await db.refresh(category)
-        
-        item_data_copy["category_id"] = category.id
-        db_item = MenuItem(**item_data_copy)
-        db.add(db_item)
-    
-    await db.commit()
+    await upsert_menu(db, menu_items_data)
+    change = await record_menu_change(db, "menu", "reset")
+    await commit_menu_changes(db, [change])
     return {"message": f"Menu reset successfully with {len(menu_items_data)} items", "items_count": len(menu_items_data)}
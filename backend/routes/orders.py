@@ -1,17 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import tuple_, update
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
+import base64
+import hashlib
+import json
 import razorpay
 
-from database import get_db, razorpay_client, RAZORPAY_KEY_ID, GST_RATE
+from database import get_db, RAZORPAY_KEY_ID, RAZORPAY_WEBHOOK_SECRET, GST_RATE
 from models import (
     OrderStatus, PaymentStatus, Order, MenuItem, Discount, User,
-    OrderCreate, OrderResponse, OrderListResponse, PaymentVerification, OrderStatusUpdate
+    OrderCreate, OrderResponse, OrderListResponse, PaymentVerification, OrderStatusUpdate,
+    OrderBulkStatusUpdate, ORDER_STATUS_TRANSITIONS
 )
 from routes.websockets import manager
+from menu_cache import menu_cache
+from pricing import PricingError, price_order
+from order_numbers import order_numbers
+from order_ingest import order_ingest
+from idempotency import idempotency_store
+from kitchen import kitchen_board, kitchen_entry, OPEN_STATUSES
+from discounts import discount_engine, DiscountUnavailable
+from kitchen_eta import kitchen_eta
+from payment_gateway import payment_gateway, GatewayUnavailable
+from payments import find_order_for_payment, set_payment_status
+from payment_events import enqueue_payment_event, parse_webhook, payment_event_worker
+from order_stats import order_counters
 from auth import get_current_user
+from backplane import backplane
 
 router = APIRouter()
 
@@ -33,52 +51,82 @@ def mask_name(name: str) -> str:
         return name[0] + "*" if len(name) > 0 else ""
     return name[0] + "*" * (len(name) - 2) + name[-1]
 
+# ===================== LIVE ORDER STATE =====================
+
+# Order fields the kitchen board, ETA model and counters work from
+ORDER_STATE_FIELDS = (
+    "id", "order_number", "table_number", "customer_name", "customer_phone",
+    "items_json", "total_amount", "status", "payment_status", "notes"
+)
+
+def track_order_change(order: Order, previous: Optional[Tuple[str, str]] = None):
+    """
+    Apply a committed order write to this worker's kitchen board and counters, and
+    send the same change to the other workers. previous is the order's
+    (status, payment_status) before the write, or None for a new order.
+    """
+    kitchen_board.upsert(order)
+    order_counters.record(order, previous)
+    state = {field: getattr(order, field) for field in ORDER_STATE_FIELDS}
+    state["status"] = getattr(order.status, "value", order.status)
+    state["payment_status"] = getattr(order.payment_status, "value", order.payment_status)
+    state["created_at"] = order.created_at.isoformat()
+    if previous is not None:
+        previous = [getattr(value, "value", value) for value in previous]
+    backplane.publish("orders", {"order": state, "previous": previous})
+
+def apply_remote_order_change(payload: Dict):
+    """Backplane handler: replay another worker's order write on our board and counters"""
+    state = dict(payload["order"])
+    state["created_at"] = datetime.fromisoformat(state["created_at"])
+    # Transient copy; never added to a session
+    order = Order(**state)
+    previous = payload.get("previous")
+    kitchen_board.upsert(order)
+    order_counters.record(order, tuple(previous) if previous else None)
+
 # ===================== ORDER APIs =====================
 
 @router.post("/api/orders", response_model=Dict)
-async def create_order(order: OrderCreate, db: AsyncSession = Depends(get_db)):
-    """Create new order"""
-    # Calculate subtotal
-    subtotal = 0
-    items_data = []
-    for item in order.items:
-        subtotal += item.price * item.quantity
-        items_data.append({
-            "menu_item_id": item.menu_item_id,
-            "name": item.name,
-            "price": item.price,
-            "quantity": item.quantity,
-            "half_full": item.half_full,
-            "notes": item.notes
-        })
+async def create_order(
+    order: OrderCreate,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None)
+):
+    """Create new order; retries with the same Idempotency-Key replay the first response"""
+    return await idempotency_store.run(
+        "create_order", idempotency_key, order.model_dump(mode="json"),
+        lambda: place_order(order, db)
+    )
+
+async def place_order(order: OrderCreate, db: AsyncSession) -> Dict:
+    """Price, persist and broadcast a new order (prices are resolved server-side from the menu snapshot)"""
+    # Resolve the discount from the cached active codes; redemption is checked again atomically on write
+    discount = await discount_engine.get(db, order.discount_code)
+    if discount and discount.unavailable_reason():
+        discount = None
     
-    # Validate and apply discount
-    discount_amount = 0
-    discount_code = None
-    if order.discount_code:
-        result = await db.execute(select(Discount).where(Discount.code == order.discount_code))
-        discount = result.scalar_one_or_none()
-        
-        if discount and discount.is_active:
-            if subtotal >= discount.min_order_amount:
-                if discount.discount_type == "percentage":
-                    discount_amount = min(
-                        subtotal * (discount.discount_value / 100),
-                        discount.max_discount or float('inf')
-                    )
-                else:
-                    discount_amount = discount.discount_value
-                discount_code = order.discount_code
-                discount.usage_count += 1
+    # Price every cart line against the cached price table - no per-line queries
+    snapshot = await menu_cache.get_snapshot(db)
+    kitchen_eta.use_menu(snapshot)
+    try:
+        priced = price_order(snapshot.price_table(), order.items, discount, GST_RATE)
+    except PricingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Calculate tax and total
-    taxable_amount = subtotal - discount_amount
-    tax_amount = round(taxable_amount * (GST_RATE / 100), 2)
-    total_amount = round(taxable_amount + tax_amount, 2)
+    items_data = priced.lines
+    subtotal = priced.subtotal
+    discount_amount = priced.discount_amount
+    tax_amount = priced.tax_amount
+    total_amount = priced.total_amount
+    discount_code = None
+    discount_id = None
+    if discount_amount:
+        discount_code = order.discount_code
+        discount_id = discount.id
     
-    # Generate order number
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    order_number = f"ORD{timestamp}{order.table_number}"
+    # Generate order number (unique per process/worker without a DB round trip)
+    order_number = order_numbers.next_order_number()
     
     # Create order
     db_order = Order(
@@ -92,11 +140,18 @@ async def create_order(order: OrderCreate, db: AsyncSession = Depends(get_db)):
         discount_code=discount_code,
         tax_amount=tax_amount,
         total_amount=total_amount,
-        notes=order.notes
+        notes=order.notes,
+        created_at=datetime.utcnow()
     )
-    db.add(db_order)
-    await db.commit()
-    await db.refresh(db_order)
+    # Group commit: the order, its line items and discount usage are written with
+    # other orders arriving in the same few milliseconds, in one transaction
+    try:
+        await order_ingest.submit(db_order, discount_id)
+    except DiscountUnavailable:
+        raise HTTPException(status_code=409, detail="Discount code is no longer available")
+    if discount_id:
+        discount_engine.record_redemption(discount_id)
+    track_order_change(db_order)
     
     # Notify kitchen and admin
     await manager.broadcast_all({
@@ -110,7 +165,8 @@ async def create_order(order: OrderCreate, db: AsyncSession = Depends(get_db)):
             "total_amount": total_amount,
             "status": db_order.status,
             "notes": order.notes,
-            "created_at": db_order.created_at.isoformat()
+            "created_at": db_order.created_at.isoformat(),
+            **kitchen_eta.describe(db_order.id)
         }
     })
     
@@ -121,17 +177,37 @@ async def create_order(order: OrderCreate, db: AsyncSession = Depends(get_db)):
         "message": "Order created successfully"
     }
 
+def encode_order_cursor(order: Order) -> str:
+    """Opaque keyset cursor for the position just after an order"""
+    raw = json.dumps({"t": order.created_at.isoformat(), "i": order.id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_order_cursor(cursor: str):
+    """Decode a cursor back into its (created_at, id) key"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(data["t"]), int(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/api/orders", response_model=List[OrderListResponse])
 async def get_orders(
+    response: Response,
     status: Optional[str] = None,
     payment_status: Optional[str] = None,
     table_number: Optional[int] = None,
     search: Optional[str] = None,
-    limit: int = Query(default=50, le=200),
+    limit: int = Query(default=50, ge=1, le=200),
     offset: int = 0,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get orders with filters"""
+    """
+    Get orders with filters, newest first.
+    Pass the X-Next-Cursor response header back as 'cursor' for the next page; keyset
+    pagination keeps deep pages as cheap as the first. 'offset' is kept for older clients.
+    """
     query = select(Order)
     
     if status:
@@ -142,11 +218,22 @@ async def get_orders(
         query = query.where(Order.table_number == table_number)
     if search:
         query = query.where(Order.order_number.contains(search))
+    if cursor:
+        created_at, order_id = decode_order_cursor(cursor)
+        # Row-value comparison so the (created_at, id) index seeks straight to the cursor
+        query = query.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id))
+    elif offset:
+        query = query.offset(offset)
     
-    query = query.order_by(Order.created_at.desc()).offset(offset).limit(limit)
+    # Fetch one extra row to learn whether another page exists
+    query = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)
     
     result = await db.execute(query)
-    return result.scalars().all()
+    orders = result.scalars().all()
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers["X-Next-Cursor"] = encode_order_cursor(orders[-1])
+    return orders
 
 @router.get("/api/orders/{order_id}", response_model=OrderResponse)
 async def get_order(order_id: int, db: AsyncSession = Depends(get_db)):
@@ -166,6 +253,115 @@ async def get_order_by_number(order_number: str, db: AsyncSession = Depends(get_
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
+class StatusTransition:
+    """Outcome of moving a set of orders to one status"""
+
+    def __init__(self):
+        self.updated: List[Tuple[Order, Tuple[str, str]]] = []
+        self.unchanged: List[Order] = []
+        self.rejected: List[Dict] = []
+
+async def transition_orders(db: AsyncSession, order_ids: List[int], status: str) -> StatusTransition:
+    """
+    Move orders to a status with conditional UPDATEs, enforcing ORDER_STATUS_TRANSITIONS.
+    Orders are grouped by the (status, payment_status) we read and each UPDATE is pinned
+    to it, so a concurrent change is reported as rejected instead of being overwritten,
+    and the previous state handed to the live counters is exactly what was replaced.
+    """
+    if status not in ORDER_STATUS_TRANSITIONS:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    
+    outcome = StatusTransition()
+    result = await db.execute(select(Order).where(Order.id.in_(order_ids)))
+    orders = {order.id: order for order in result.scalars().all()}
+    
+    # observed (status, payment_status) -> order ids
+    candidates: Dict[Tuple[str, str], List[int]] = {}
+    for order_id in dict.fromkeys(order_ids):
+        order = orders.get(order_id)
+        if order is None:
+            outcome.rejected.append({"order_id": order_id, "status": None, "detail": "Order not found"})
+        elif order.status == status:
+            outcome.unchanged.append(order)
+        elif status not in ORDER_STATUS_TRANSITIONS.get(order.status, ()):
+            outcome.rejected.append({
+                "order_id": order_id,
+                "status": order.status,
+                "detail": f"Cannot change order from {order.status} to {status}"
+            })
+        else:
+            candidates.setdefault((order.status, order.payment_status), []).append(order_id)
+    
+    if candidates:
+        values = {"status": status}
+        if status == OrderStatus.COMPLETED.value:
+            values["completed_at"] = datetime.utcnow()
+        # At most one UPDATE per source state (a handful), all in one transaction
+        for previous, ids in candidates.items():
+            result = await db.execute(
+                update(Order)
+                .where(Order.id.in_(ids), Order.status == previous[0], Order.payment_status == previous[1])
+                .values(**values)
+                .returning(Order.id)
+                .execution_options(synchronize_session="fetch")
+            )
+            changed = set(result.scalars().all())
+            for order_id in ids:
+                if order_id in changed:
+                    outcome.updated.append((orders[order_id], previous))
+                else:
+                    outcome.rejected.append({
+                        "order_id": order_id,
+                        "status": orders[order_id].status,
+                        "detail": "Order status changed concurrently"
+                    })
+        await db.commit()
+    
+    for order, previous in outcome.updated:
+        track_order_change(order, previous)
+    return outcome
+
+def order_summary(order: Order) -> Dict:
+    """Fields staff screens need to refresh an order row"""
+    return {
+        "id": order.id,
+        "order_number": order.order_number,
+        "table_number": order.table_number,
+        "status": order.status,
+        "payment_status": order.payment_status
+    }
+
+@router.put("/api/orders/status")
+async def bulk_update_order_status(
+    status_update: OrderBulkStatusUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Move several orders to one status; illegal transitions are reported per order"""
+    if not status_update.order_ids:
+        raise HTTPException(status_code=400, detail="No orders given")
+    if len(status_update.order_ids) > 200:
+        raise HTTPException(status_code=400, detail="At most 200 orders per request")
+    
+    outcome = await transition_orders(db, status_update.order_ids, status_update.status)
+    
+    if outcome.updated:
+        # One combined frame for staff screens instead of one broadcast per order
+        await manager.broadcast_all({
+            "type": "orders_updated",
+            "status": status_update.status,
+            "orders": [order_summary(order) for order, _ in outcome.updated]
+        })
+        for order, _ in outcome.updated:
+            await push_order_status(order)
+    
+    return {
+        "status": status_update.status,
+        "updated": [order.id for order, _ in outcome.updated],
+        "unchanged": [order.id for order in outcome.unchanged],
+        "rejected": outcome.rejected
+    }
+
 @router.put("/api/orders/{order_id}/status")
 async def update_order_status(
     order_id: int, 
@@ -173,34 +369,25 @@ async def update_order_status(
     db: AsyncSession = Depends(get_db)
 ):
     """Update order status"""
-    valid_statuses = [s.value for s in OrderStatus]
-    if status_update.status not in valid_statuses:
-        raise HTTPException(status_code=400, detail="Invalid status")
+    outcome = await transition_orders(db, [order_id], status_update.status)
+    if outcome.rejected:
+        rejection = outcome.rejected[0]
+        if rejection["status"] is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        raise HTTPException(status_code=409, detail=rejection["detail"])
+    if not outcome.updated:
+        return {"message": "Order status unchanged", "status": status_update.status}
     
-    result = await db.execute(select(Order).where(Order.id == order_id))
-    order = result.scalar_one_or_none()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    order.status = status_update.status
-    if status_update.status == OrderStatus.COMPLETED.value:
-        order.completed_at = datetime.utcnow()
-    
-    await db.commit()
+    order = outcome.updated[0][0]
     
     # Notify all connected clients
     await manager.broadcast_all({
         "type": "order_updated",
         "order_id": order_id,
         "status": status_update.status,
-        "order": {
-            "id": order.id,
-            "order_number": order.order_number,
-            "table_number": order.table_number,
-            "status": order.status,
-            "payment_status": order.payment_status
-        }
+        "order": order_summary(order)
     })
+    await push_order_status(order)
     
     return {"message": "Order status updated", "status": status_update.status}
 
@@ -209,80 +396,71 @@ async def update_order_status(
 @router.get("/api/kitchen/orders")
 async def get_kitchen_orders(
     status: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=500),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all orders for kitchen display - requires authentication"""
-    query = select(Order).distinct().order_by(Order.created_at.desc())
-    if status:
-        query = query.where(Order.status == status)
+    """Get orders for kitchen display - requires authentication"""
+    # Open orders come from the in-memory working set
+    if status is None or status in OPEN_STATUSES:
+        if not kitchen_board.loaded:
+            await kitchen_board.load(db)
+        return kitchen_board.orders(status)
     
-    result = await db.execute(query)
-    orders = result.scalars().all()
-    
-    kitchen_orders = []
-    for order in orders:
-        kitchen_orders.append({
-            "id": order.id,
-            "order_number": order.order_number,
-            "table_number": order.table_number,
-            "customer_name": order.customer_name,
-            "customer_phone": order.customer_phone,
-            "items": order.items_json,
-            "total_amount": order.total_amount,
-            "status": order.status,
-            "payment_status": order.payment_status,
-            "notes": order.notes,
-            "created_at": order.created_at.isoformat(),
-            "time_elapsed": int((datetime.utcnow() - order.created_at).total_seconds() / 60)
-        })
-    
-    return kitchen_orders
+    # Completed/cancelled lookups still go to the database
+    result = await db.execute(
+        select(Order)
+        .where(Order.status == status)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit)
+    )
+    now = datetime.utcnow()
+    return [kitchen_entry(order, now) for order in result.scalars().all()]
 
 @router.get("/api/kitchen/stats")
 async def get_kitchen_stats(
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get kitchen statistics - requires authentication"""
-    today = datetime.utcnow().date()
-    today_start = datetime.combine(today, datetime.min.time())
-    
-    result = await db.execute(
-        select(Order).where(Order.created_at >= today_start)
-    )
-    today_orders = result.scalars().all()
-    
-    pending = sum(1 for o in today_orders if o.status in ["pending", "accepted"])
-    preparing = sum(1 for o in today_orders if o.status == "preparing")
-    ready = sum(1 for o in today_orders if o.status == "ready")
-    completed = sum(1 for o in today_orders if o.status == "completed")
-    total_revenue = sum(o.total_amount for o in today_orders if o.payment_status == "paid")
+    today = order_counters.day(datetime.utcnow().date())
     
     return {
-        "pending_orders": pending,
-        "preparing_orders": preparing,
-        "ready_orders": ready,
-        "completed_today": completed,
-        "total_revenue_today": total_revenue
+        "pending_orders": today.by_status["pending"] + today.by_status["accepted"],
+        "preparing_orders": today.by_status["preparing"],
+        "ready_orders": today.by_status["ready"],
+        "completed_today": today.by_status["completed"],
+        "total_revenue_today": today.revenue
     }
 
 # ===================== PAYMENT APIs =====================
 
 @router.post("/api/payment/create-order")
-async def create_payment_order(order_data: Dict, db: AsyncSession = Depends(get_db)):
-    """Create Razorpay order for payment"""
+async def create_payment_order(
+    order_data: Dict,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None)
+):
+    """Create Razorpay order for payment; idempotent per Idempotency-Key"""
+    return await idempotency_store.run(
+        "create_payment_order", idempotency_key, order_data,
+        lambda: open_payment_order(order_data, db)
+    )
+
+async def open_payment_order(order_data: Dict, db: AsyncSession) -> Dict:
+    """Create the gateway order for an existing order and remember its id for verification"""
     order_id = order_data.get("order_id")
-    amount = order_data.get("amount")
     
     result = await db.execute(select(Order).where(Order.id == order_id))
     order = result.scalar_one_or_none()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    if order.payment_status == "paid":
+        raise HTTPException(status_code=400, detail="Order is already paid")
     
     try:
-        razorpay_order = razorpay_client.order.create({
-            "amount": int(amount * 100),
+        # Charge the server-side total; the amount sent by the client is ignored
+        razorpay_order = await payment_gateway.create_order({
+            "amount": int(round(order.total_amount * 100)),
             "currency": "INR",
             "receipt": order.order_number,
             "notes": {
@@ -291,81 +469,121 @@ async def create_payment_order(order_data: Dict, db: AsyncSession = Depends(get_
             }
         })
         
+        order.razorpay_order_id = razorpay_order["id"]
+        await db.commit()
+        
         return {
             "order_id": razorpay_order["id"],
             "amount": razorpay_order["amount"],
             "currency": razorpay_order["currency"],
             "key_id": RAZORPAY_KEY_ID
         }
+    except GatewayUnavailable:
+        raise HTTPException(status_code=503, detail="Payment gateway is unavailable, please retry shortly")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Payment creation failed: {str(e)}")
 
 @router.post("/api/payment/verify")
 async def verify_payment(
     payment: PaymentVerification,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None)
 ):
-    """Verify Razorpay payment signature"""
+    """Verify Razorpay payment signature; idempotent per Idempotency-Key"""
+    return await idempotency_store.run(
+        "verify_payment", idempotency_key, payment.model_dump(),
+        lambda: apply_payment_verification(payment, db)
+    )
+
+async def apply_payment_verification(payment: PaymentVerification, db: AsyncSession) -> Dict:
+    """Check the payment signature and mark the matching order paid"""
     try:
-        razorpay_client.utility.verify_payment_signature({
+        payment_gateway.verify_payment_signature({
             "razorpay_payment_id": payment.razorpay_payment_id,
             "razorpay_order_id": payment.razorpay_order_id,
             "razorpay_signature": payment.razorpay_signature
         })
         
-        # Find order by Razorpay order ID stored in receipt field
-        # receipt contains the order_number
-        razorpay_order = razorpay_client.order.fetch(payment.razorpay_order_id)
-        receipt = razorpay_order.get("receipt", "")
+        # Gateway order ids are stored when the payment is opened - one indexed lookup
+        order = await find_order_for_payment(db, payment.razorpay_order_id)
         
-        # Try to find order by order_number containing the receipt
-        result = await db.execute(
-            select(Order).where(Order.order_number == receipt)
-        )
-        order = result.scalar_one_or_none()
-        
-        # If not found by exact match, try partial match
+        # Superseded checkout attempts and pre-upgrade orders: resolve via the receipt
         if not order:
+            razorpay_order = await payment_gateway.fetch_order(payment.razorpay_order_id)
             result = await db.execute(
-                select(Order).where(Order.order_number.contains(receipt[-8:]))
+                select(Order).where(Order.order_number == razorpay_order.get("receipt", ""))
             )
             order = result.scalar_one_or_none()
         
         if order:
-            order.payment_status = "paid"
-            order.payment_id = payment.razorpay_payment_id
+            # Conditional, so a webhook applying the same payment concurrently announces it only once.
             # Don't auto-accept order - let kitchen staff verify and accept
+            previous = await set_payment_status(db, order, "paid", payment.razorpay_payment_id)
             await db.commit()
-            
-            await manager.broadcast_all({
-                "type": "payment_completed",
-                "order_id": order.id,
-                "payment_id": payment.razorpay_payment_id,
-                "order": {
-                    "id": order.id,
-                    "order_number": order.order_number,
-                    "status": order.status,
-                    "payment_status": order.payment_status
-                }
-            })
+            if previous is not None:
+                await announce_payment(order, previous)
         
         return {"message": "Payment verified successfully", "status": "success"}
     except razorpay.errors.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Payment verification failed")
+    except GatewayUnavailable:
+        raise HTTPException(status_code=503, detail="Payment gateway is unavailable, please retry shortly")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-# ===================== ORDER STATUS PAGE API (MASKED) =====================
+async def announce_payment(order: Order, previous: Tuple[str, str]):
+    """Update live views and notify staff and the customer once an order is paid"""
+    track_order_change(order, previous)
+    await manager.broadcast_all({
+        "type": "payment_completed",
+        "order_id": order.id,
+        "payment_id": order.payment_id,
+        "order": {
+            "id": order.id,
+            "order_number": order.order_number,
+            "status": order.status,
+            "payment_status": order.payment_status
+        }
+    })
+    await push_order_status(order)
 
-@router.get("/api/order/track/{order_number}")
-async def track_order(order_number: str, db: AsyncSession = Depends(get_db)):
-    """Track order status - returns masked customer data to prevent scraping"""
-    result = await db.execute(select(Order).where(Order.order_number == order_number))
-    order = result.scalar_one_or_none()
+async def announce_payment_failed(order: Order, previous: Tuple[str, str]):
+    """Update live views and the customer's status page after a failed payment attempt"""
+    track_order_change(order, previous)
+    await push_order_status(order)
+
+@router.post("/api/payment/webhook")
+async def payment_webhook(
+    request: Request,
+    x_razorpay_signature: Optional[str] = Header(default=None),
+    x_razorpay_event_id: Optional[str] = Header(default=None)
+):
+    """
+    Razorpay webhook receiver. Events are only authenticated and queued here; the
+    payment event worker applies them to orders in batches.
+    """
+    if not RAZORPAY_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Payment webhooks are not configured")
     
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+    body = (await request.body()).decode("utf-8")
+    try:
+        payment_gateway.verify_webhook_signature(body, x_razorpay_signature or "", RAZORPAY_WEBHOOK_SECRET)
+        event = json.loads(body)
+    except (razorpay.errors.SignatureVerificationError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
     
+    event_type, payment_id, razorpay_order_id = parse_webhook(event)
+    # Retries of one delivery share the event id header
+    event_id = x_razorpay_event_id or hashlib.sha256(body.encode("utf-8")).hexdigest()
+    queued = await enqueue_payment_event(event_id, event_type, payment_id, razorpay_order_id, event)
+    if queued:
+        payment_event_worker.wake()
+    return {"status": "queued" if queued else "duplicate"}
+
+# ===================== ORDER STATUS PAGE API (MASKED) =====================
+
+def order_tracking_payload(order: Order) -> Dict:
+    """Masked order status shared by the tracking endpoint and customer pushes"""
     time_elapsed = int((datetime.utcnow() - order.created_at).total_seconds() / 60)
     
     return {
@@ -380,7 +598,8 @@ async def track_order(order_number: str, db: AsyncSession = Depends(get_db)):
             "status": order.status,
             "payment_status": order.payment_status,
             "created_at": order.created_at.isoformat(),
-            "time_elapsed": time_elapsed
+            "time_elapsed": time_elapsed,
+            **kitchen_eta.describe(order.id)
         },
         "status_history": [
             {"status": "pending", "label": "Order Placed", "completed": True},
@@ -391,6 +610,24 @@ async def track_order(order_number: str, db: AsyncSession = Depends(get_db)):
         ]
     }
 
+async def push_order_status(order: Order):
+    """Push the tracking payload to customers following this order"""
+    await manager.send_to_customer(order.order_number, {
+        "type": "order_status",
+        **order_tracking_payload(order)
+    })
+
+@router.get("/api/order/track/{order_number}")
+async def track_order(order_number: str, db: AsyncSession = Depends(get_db)):
+    """Track order status - returns masked customer data to prevent scraping"""
+    result = await db.execute(select(Order).where(Order.order_number == order_number))
+    order = result.scalar_one_or_none()
+    
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    return order_tracking_payload(order)
+
 @router.get("/api/order/bill/{order_number}")
 async def generate_bill(order_number: str, db: AsyncSession = Depends(get_db)):
     """Generate bill details for order"""
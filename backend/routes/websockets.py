@@ -1,9 +1,84 @@
+import asyncio
 import json
-from typing import Dict, Set
+from itertools import chain
+from typing import Dict, Iterable, Set
+import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from database import WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT_SECONDS
+from backplane import backplane
+
 router = APIRouter()
 
+def encode_message(message: dict) -> str:
+    """Serialize a websocket message once into a text frame; datetimes and enums are encoded natively"""
+    return orjson.dumps(message).decode("utf-8")
+
+# Sent in place of the backlog to a client that fell behind; it should refetch its data
+RESYNC_FRAME = encode_message({"type": "resync"})
+PONG_FRAME = encode_message({"type": "pong"})
+
+class ClientConnection:
+    """
+    One socket's outbound side: a bounded queue drained by its own writer task, so
+    a slow screen only ever delays itself. A client whose queue fills up has its
+    backlog replaced by a single resync message; if it still can't keep up, or a
+    single send takes longer than WS_SEND_TIMEOUT_SECONDS, it is disconnected.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int = WS_SEND_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT_SECONDS):
+        self.websocket = websocket
+        self.send_timeout = send_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(2, max_queue))
+        self.resync_pending = False
+        self.closed = False
+        self._writer = asyncio.create_task(self._write())
+
+    def send(self, frame: str) -> bool:
+        """Queue an encoded frame without waiting; returns False once the client has been dropped"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            if self.resync_pending:
+                # Hasn't even drained the last resync - give up on this client
+                self.close()
+                return False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME)
+            self.resync_pending = True
+        return True
+
+    async def _write(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                if frame is RESYNC_FRAME:
+                    self.resync_pending = False
+                await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Timed out or the socket is gone; the receive loop cleans up the registration
+            self.close()
+
+    def close(self, close_socket: bool = True):
+        """Stop writing and, for dropped clients, close the socket so its receive loop ends"""
+        if self.closed:
+            return
+        self.closed = True
+        self._writer.cancel()
+        if close_socket:
+            asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close(code=1013)
+        except Exception:
+            pass
+
 class ConnectionManager:
     """Manages WebSocket connections for real-time updates"""
     
@@ -11,56 +86,93 @@ class ConnectionManager:
         self.active_connections: Dict[str, Set[WebSocket]] = {
             "kitchen": set(),
             "admin": set(),
+            "menu": set(),
+            # order number -> sockets, so every open tab for an order gets updates
             "customer": {}
         }
+        self.clients: Dict[WebSocket, ClientConnection] = {}
     
     async def connect(self, websocket: WebSocket, client_type: str, identifier: str = None):
         """Accept new WebSocket connection"""
         await websocket.accept()
+        self.clients[websocket] = ClientConnection(websocket)
         if client_type == "kitchen":
             self.active_connections["kitchen"].add(websocket)
         elif client_type == "admin":
             self.active_connections["admin"].add(websocket)
+        elif client_type == "menu":
+            self.active_connections["menu"].add(websocket)
         elif client_type == "customer" and identifier:
-            self.active_connections["customer"][identifier] = websocket
+            self.active_connections["customer"].setdefault(identifier, set()).add(websocket)
     
     def disconnect(self, websocket: WebSocket, client_type: str, identifier: str = None):
         """Remove WebSocket connection"""
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            client.close(close_socket=False)
         if client_type == "kitchen":
             self.active_connections["kitchen"].discard(websocket)
         elif client_type == "admin":
             self.active_connections["admin"].discard(websocket)
+        elif client_type == "menu":
+            self.active_connections["menu"].discard(websocket)
         elif client_type == "customer" and identifier:
-            self.active_connections["customer"].pop(identifier, None)
+            sockets = self.active_connections["customer"].get(identifier)
+            if sockets is not None:
+                sockets.discard(websocket)
+                if not sockets:
+                    del self.active_connections["customer"][identifier]
+    
+    def send(self, websocket: WebSocket, frame: str):
+        """Queue an encoded frame for one socket"""
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.send(frame)
+    
+    def _audience(self, target: str, identifier: str = None) -> Iterable[WebSocket]:
+        connections = self.active_connections
+        if target == "all":
+            return chain(connections["kitchen"], connections["admin"])
+        if target == "menu":
+            return chain(connections["kitchen"], connections["admin"], connections["menu"], *connections["customer"].values())
+        if target == "customer":
+            return connections["customer"].get(identifier, ())
+        return connections[target]
+    
+    def _deliver(self, target: str, frame: str, identifier: str = None):
+        # Enqueue only - each socket's writer task does the actual sending
+        for websocket in list(self._audience(target, identifier)):
+            self.send(websocket, frame)
+    
+    def _broadcast(self, target: str, message: dict, identifier: str = None):
+        # Encode once for every recipient on every worker
+        frame = encode_message(message)
+        self._deliver(target, frame, identifier)
+        backplane.publish("ws", {"target": target, "identifier": identifier, "frame": frame})
+    
+    def deliver_remote(self, payload: Dict):
+        """Backplane handler: deliver a frame broadcast by another worker to our sockets"""
+        self._deliver(payload["target"], payload["frame"], payload.get("identifier"))
     
     async def broadcast_to_kitchen(self, message: dict):
         """Send message to all kitchen displays"""
-        for connection in list(self.active_connections["kitchen"]):
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        self._broadcast("kitchen", message)
     
     async def broadcast_to_admin(self, message: dict):
         """Send message to all admin panels"""
-        for connection in list(self.active_connections["admin"]):
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        self._broadcast("admin", message)
     
     async def broadcast_all(self, message: dict):
         """Send message to all connected clients"""
-        await self.broadcast_to_kitchen(message)
-        await self.broadcast_to_admin(message)
+        self._broadcast("all", message)
+    
+    async def broadcast_menu(self, message: dict):
+        """Send menu updates to staff screens, menu subscribers and customers"""
+        self._broadcast("menu", message)
     
-    async def send_to_customer(self, order_id: str, message: dict):
-        """Send message to specific customer"""
-        if order_id in self.active_connections["customer"]:
-            try:
-                await self.active_connections["customer"][order_id].send_json(message)
-            except:
-                pass
+    async def send_to_customer(self, identifier: str, message: dict):
+        """Send message to every tab subscribed to an order"""
+        self._broadcast("customer", message, identifier)
 
 manager = ConnectionManager()
 
@@ -75,6 +187,8 @@ async def websocket_endpoint(websocket: WebSocket, client_type: str, identifier:
             message = json.loads(data)
             
             if message.get("type") == "ping":
-                await websocket.send_json({"type": "pong"})
+                manager.send(websocket, PONG_FRAME)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, client_type, identifier)
@@ -0,0 +1,188 @@
+import re
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+# ===================== TEXT NORMALIZATION =====================
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {"name": 3.0, "subcategory": 1.5, "description": 1.0}
+
+# Score multipliers by match kind
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = 0.6
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase and split text into alphanumeric tokens"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower().replace("_", " "))
+
+def trigrams(token: str) -> Set[str]:
+    """Padded character trigrams of a token"""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_typos(token: str) -> int:
+    """Number of edits tolerated for a query token of this length"""
+    if len(token) <= 3:
+        return 0
+    if len(token) <= 6:
+        return 1
+    return 2
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, short-circuiting above limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+# ===================== MENU SEARCH INDEX =====================
+
+class MenuSearchIndex:
+    """Inverted token index with a trigram vocabulary index for typo tolerance"""
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._docs: Dict[int, Tuple] = {}
+        self._doc_tokens: Dict[int, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+
+    @staticmethod
+    def _fingerprint(item: Dict) -> Tuple:
+        return (item["name"], item["description"], item["subcategory"])
+
+    def _add_token(self, token: str, item_id: int, weight: float):
+        postings = self._postings.get(token)
+        if postings is None:
+            postings = self._postings[token] = {}
+            insort(self._vocabulary, token)
+            for gram in trigrams(token):
+                self._trigrams.setdefault(gram, set()).add(token)
+        postings[item_id] = weight
+
+    def _remove_token(self, token: str, item_id: int):
+        postings = self._postings[token]
+        postings.pop(item_id, None)
+        if postings:
+            return
+        del self._postings[token]
+        del self._vocabulary[bisect_left(self._vocabulary, token)]
+        for gram in trigrams(token):
+            tokens = self._trigrams[gram]
+            tokens.discard(token)
+            if not tokens:
+                del self._trigrams[gram]
+
+    def add(self, item: Dict):
+        """Index (or re-index) a single menu item"""
+        self.remove(item["id"])
+        weights: Dict[str, float] = {}
+        for field, field_weight in FIELD_WEIGHTS.items():
+            for token in tokenize(item[field]):
+                weights[token] = max(weights.get(token, 0.0), field_weight)
+        for token, weight in weights.items():
+            self._add_token(token, item["id"], weight)
+        self._docs[item["id"]] = self._fingerprint(item)
+        self._doc_tokens[item["id"]] = weights
+
+    def remove(self, item_id: int):
+        """Drop a menu item from the index"""
+        weights = self._doc_tokens.pop(item_id, None)
+        if weights is None:
+            return
+        self._docs.pop(item_id, None)
+        for token in weights:
+            self._remove_token(token, item_id)
+
+    def sync(self, version: int, items: List[Dict]):
+        """Bring the index up to date with a menu snapshot, touching only changed items"""
+        if self.version == version:
+            return
+        current_ids = set()
+        for item in items:
+            current_ids.add(item["id"])
+            if self._docs.get(item["id"]) != self._fingerprint(item):
+                self.add(item)
+        for item_id in [item_id for item_id in self._docs if item_id not in current_ids]:
+            self.remove(item_id)
+        self.version = version
+
+    def _expand(self, query_token: str, allow_prefix: bool) -> Dict[str, float]:
+        """Vocabulary tokens matching a query token, with their match quality"""
+        matches: Dict[str, float] = {}
+        if query_token in self._postings:
+            matches[query_token] = EXACT_MATCH
+
+        if allow_prefix:
+            start = bisect_left(self._vocabulary, query_token)
+            for token in self._vocabulary[start:]:
+                if not token.startswith(query_token):
+                    break
+                if token != query_token:
+                    matches[token] = PREFIX_MATCH * len(query_token) / len(token) + 0.1
+
+        limit = max_typos(query_token)
+        if limit:
+            candidates: Set[str] = set()
+            for gram in trigrams(query_token):
+                candidates.update(self._trigrams.get(gram, ()))
+            for token in candidates:
+                if token in matches:
+                    continue
+                distance = edit_distance(query_token, token, limit)
+                # As-you-type: also forgive typos inside a partially typed word
+                if distance > limit and allow_prefix and len(token) > len(query_token):
+                    distance = edit_distance(query_token, token[:len(query_token)], limit)
+                if distance <= limit:
+                    matches[token] = FUZZY_MATCH * (1 - distance / (len(query_token) + 1))
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return (item_id, score) pairs ranked by relevance; every query word must match"""
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        scores: Optional[Dict[int, float]] = None
+        for position, query_token in enumerate(query_tokens):
+            is_last = position == len(query_tokens) - 1
+            token_scores: Dict[int, float] = {}
+            for token, quality in self._expand(query_token, allow_prefix=is_last).items():
+                for item_id, weight in self._postings[token].items():
+                    score = quality * weight
+                    if score > token_scores.get(item_id, 0.0):
+                        token_scores[item_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    item_id: score + token_scores[item_id]
+                    for item_id, score in scores.items() if item_id in token_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+        return ranked[:limit] if limit else ranked
+
+menu_search_index = MenuSearchIndex()
@@ -1,4 +1,5 @@
 const CACHE_NAME = 'delicacy-restaurant-v1'
+const MENU_CACHE_NAME = 'delicacy-menu-v1'
 const STATIC_ASSETS = [
   '/',
   '/index.html',
@@ -22,7 +23,7 @@ self.addEventListener('activate', (event) => {
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames
-          .filter((name) => name !== CACHE_NAME)
+          .filter((name) => name !== CACHE_NAME && name !== MENU_CACHE_NAME)
           .map((name) => caches.delete(name))
       )
     })
@@ -102,3 +103,48 @@ async function syncOrders() {
   // Get pending orders from IndexedDB and sync
   console.log('Syncing offline orders...')
 }
+
+// Menu delta sync - keeps the offline menu current via /api/menu/changes
+self.addEventListener('message', (event) => {
+  if (event.data && event.data.type === 'sync-menu') {
+    event.waitUntil(syncMenu(event.data.apiBaseUrl || ''))
+  }
+})
+
+async function syncMenu(apiBaseUrl) {
+  const cache = await caches.open(MENU_CACHE_NAME)
+  const menuUrl = `${apiBaseUrl}/api/menu`
+  const cached = await cache.match(menuUrl)
+  const revision = cached && cached.headers.get('X-Menu-Revision')
+  
+  if (revision) {
+    const delta = await fetch(`${apiBaseUrl}/api/menu/changes?since=${revision}`).then((r) => r.json())
+    if (!delta.resync) {
+      if (delta.changes.length === 0) return
+      
+      // Apply item changes to the cached menu; unavailable items drop out like on the server
+      const items = new Map((await cached.json()).map((item) => [item.id, item]))
+      for (const change of delta.changes) {
+        if (change.entity !== 'item') continue
+        if (change.action === 'deleted' || !change.data.is_available) {
+          items.delete(change.id)
+        } else {
+          items.set(change.id, change.data)
+        }
+      }
+      await cache.put(menuUrl, new Response(JSON.stringify([...items.values()]), {
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Menu-Revision': String(delta.revision)
+        }
+      }))
+      return
+    }
+  }
+  
+  // No usable revision - fall back to a full fetch
+  const response = await fetch(menuUrl)
+  if (response.ok) {
+    await cache.put(menuUrl, response)
+  }
+}
@@ -99,6 +99,16 @@ export async function getMenu(params = {}) {
   return fetchAPI(`/api/menu${queryString ? `?${queryString}` : ''}`)
 }
 
+export async function searchMenu(query, params = {}) {
+  const queryString = new URLSearchParams({ q: query, ...params }).toString()
+  return fetchAPI(`/api/menu/search?${queryString}`)
+}
+
+// Ask the service worker (when one controls the page) to bring its offline menu up to date
+export function syncOfflineMenu() {
+  navigator.serviceWorker?.controller?.postMessage({ type: 'sync-menu', apiBaseUrl: API_BASE_URL })
+}
+
 export async function getMenuItem(id) {
   return fetchAPI(`/api/menu/${id}`)
 }
@@ -203,6 +213,26 @@ export async function getOrders(params = {}) {
   return fetchAPI(`/api/orders${queryString ? `?${queryString}` : ''}`)
 }
 
+// Keyset-paginated orders; pass nextCursor back as params.cursor for the following page
+export async function getOrdersPage(params = {}) {
+  const queryString = new URLSearchParams(params).toString()
+  const url = `${API_BASE_URL}/api/orders${queryString ? `?${queryString}` : ''}`
+  const headers = {}
+  const token = localStorage.getItem('admin_token')
+  if (token) {
+    headers['Authorization'] = `Bearer ${token}`
+  }
+  const response = await fetch(url, { headers })
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}))
+    throw new Error(errorData.detail || `HTTP error ${response.status}`)
+  }
+  return {
+    orders: await response.json(),
+    nextCursor: response.headers.get('X-Next-Cursor'),
+  }
+}
+
 export async function getOrder(id) {
   return fetchAPI(`/api/orders/${id}`)
 }
@@ -211,9 +241,36 @@ export async function getOrderByNumber(orderNumber) {
   return fetchAPI(`/api/orders/number/${orderNumber}`)
 }
 
-export async function createOrder(data) {
+// Retries sharing an idempotency key replay the first response instead of re-running it
+function idempotencyHeaders(idempotencyKey) {
+  return idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}
+}
+
+// crypto.randomUUID only exists in secure contexts; QR links opened over plain HTTP on the LAN don't have it
+export function newIdempotencyKey() {
+  if (typeof crypto !== 'undefined' && crypto.randomUUID) {
+    return crypto.randomUUID()
+  }
+  const bytes = new Uint8Array(16)
+  if (typeof crypto !== 'undefined' && crypto.getRandomValues) {
+    crypto.getRandomValues(bytes)
+  } else {
+    for (let i = 0; i < bytes.length; i++) bytes[i] = Math.floor(Math.random() * 256)
+  }
+  // RFC 4122 version 4 layout
+  bytes[6] = (bytes[6] & 0x0f) | 0x40
+  bytes[8] = (bytes[8] & 0x3f) | 0x80
+  const hex = [...bytes].map(b => b.toString(16).padStart(2, '0')).join('')
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`
+}
+
+export async function createOrder(data, idempotencyKey = null) {
   return fetchAPI('/api/orders', {
     method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...idempotencyHeaders(idempotencyKey),
+    },
     body: JSON.stringify(data),
   })
 }
@@ -225,6 +282,13 @@ export async function updateOrderStatus(id, status) {
   })
 }
 
+export async function bulkUpdateOrderStatus(orderIds, status) {
+  return fetchAPI('/api/orders/status', {
+    method: 'PUT',
+    body: JSON.stringify({ order_ids: orderIds, status }),
+  })
+}
+
 // ===================== Kitchen =====================
 
 export async function getKitchenOrders(status = null) {
@@ -238,16 +302,24 @@ export async function getKitchenStats() {
 
 // ===================== Payment =====================
 
-export async function createPaymentOrder(orderId, amount) {
+export async function createPaymentOrder(orderId, amount, idempotencyKey = null) {
   return fetchAPI('/api/payment/create-order', {
     method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...idempotencyHeaders(idempotencyKey),
+    },
     body: JSON.stringify({ order_id: orderId, amount }),
   })
 }
 
-export async function verifyPayment(data) {
+export async function verifyPayment(data, idempotencyKey = null) {
   return fetchAPI('/api/payment/verify', {
     method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...idempotencyHeaders(idempotencyKey),
+    },
     body: JSON.stringify(data),
   })
 }
@@ -344,10 +416,12 @@ export default {
   validateDiscount,
   deleteDiscount,
   getOrders,
+  getOrdersPage,
   getOrder,
   getOrderByNumber,
   createOrder,
   updateOrderStatus,
+  bulkUpdateOrderStatus,
   getKitchenOrders,
   getKitchenStats,
   createPaymentOrder,
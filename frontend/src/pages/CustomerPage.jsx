@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react'
+import { useState, useEffect, useCallback, useRef } from 'react'
 import { useParams, useNavigate } from 'react-router-dom'
 import { motion, AnimatePresence } from 'framer-motion'
 import { 
@@ -8,7 +8,8 @@ import {
 
 import Navbar from '../components/Navbar'
 import Footer from '../components/Footer'
-import { getMenu, getCategories, createOrder, createPaymentOrder, verifyPayment } from '../lib/api'
+import { getMenu, searchMenu, syncOfflineMenu, getCategories, createOrder, createPaymentOrder, verifyPayment, newIdempotencyKey } from '../lib/api'
+import useWebSocket from '../hooks/useWebSocket'
 import { useCartStore, useToastStore } from '../store/store'
 
 // Import modular customer page components
@@ -31,6 +32,7 @@ export default function CustomerPage() {
   const [filteredMenu, setFilteredMenu] = useState([])
   const [loading, setLoading] = useState(true)
   const [search, setSearch] = useState('')
+  const [searchResults, setSearchResults] = useState(null)
   const [selectedCategory, setSelectedCategory] = useState('all')
   const [selectedSubcategory, setSelectedSubcategory] = useState(null)
   const [vegFilter, setVegFilter] = useState('all')
@@ -44,6 +46,10 @@ export default function CustomerPage() {
   const [errorDetails, setErrorDetails] = useState(null)
 
   const { cart, addToCart, removeFromCart, updateQuantity, clearCart, setTableNumber, getTotal } = useCartStore()
+  
+  // One idempotency key per distinct order body, so double taps and retries can't duplicate
+  // the order, while a retry after editing the cart or details gets a fresh key
+  const checkoutKeyRef = useRef(null)
   const { addToast } = useToastStore()
 
   useEffect(() => {
@@ -85,9 +91,67 @@ export default function CustomerPage() {
     fetchCategories()
   }, [])
   
+  // Ranked, typo-tolerant search runs on the server; debounced while typing
+  useEffect(() => {
+    const query = search.trim()
+    if (!query) {
+      setSearchResults(null)
+      return
+    }
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      try {
+        const results = await searchMenu(query, { limit: 100 })
+        if (!cancelled) setSearchResults(results.map(item => item.id))
+      } catch (error) {
+        // Fall back to matching names locally
+        if (!cancelled) setSearchResults(undefined)
+      }
+    }, 200)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [search])
+  
   useEffect(() => {
     filterMenu()
-  }, [menu, search, selectedCategory, selectedSubcategory, vegFilter, sortBy])
+  }, [menu, search, searchResults, selectedCategory, selectedSubcategory, vegFilter, sortBy])
+  
+  // Live menu edits (price, availability, new dishes) without a reload
+  const handleMenuMessage = useCallback((data) => {
+    if (data.type === 'resync') {
+      fetchMenu()
+      fetchCategories()
+      return
+    }
+    if (data.type !== 'menu_changed') return
+    
+    if (data.changes.some(change => change.action === 'reset')) {
+      fetchMenu()
+      fetchCategories()
+    } else {
+      // Same rule as GET /api/menu: unavailable items drop out
+      setMenu(prev => {
+        const items = new Map(prev.map(item => [item.id, item]))
+        for (const change of data.changes) {
+          if (change.entity !== 'item') continue
+          if (change.action === 'deleted' || !change.data?.is_available) {
+            items.delete(change.id)
+          } else {
+            items.set(change.id, change.data)
+          }
+        }
+        return [...items.values()]
+      })
+      if (data.changes.some(change => change.entity === 'category')) {
+        fetchCategories()
+      }
+    }
+    syncOfflineMenu()
+  }, [])
+  
+  useWebSocket('menu', null, handleMenuMessage)
   
   const fetchMenu = async () => {
     try {
@@ -139,8 +203,13 @@ export default function CustomerPage() {
   
   const filterMenu = useCallback(() => {
     let filtered = [...menu]
+    const ranked = search.trim() && searchResults
     
-    if (search) {
+    if (ranked) {
+      // Keep the server's relevance order
+      const byId = new Map(menu.map(item => [item.id, item]))
+      filtered = searchResults.map(id => byId.get(id)).filter(Boolean)
+    } else if (search) {
       filtered = filtered.filter(item => 
         item.name.toLowerCase().includes(search.toLowerCase())
       )
@@ -167,12 +236,12 @@ export default function CustomerPage() {
       filtered.sort((a, b) => (a.price_half || a.price) - (b.price_half || b.price))
     } else if (sortBy === 'price-high') {
       filtered.sort((a, b) => (b.price_half || b.price) - (a.price_half || a.price))
-    } else if (sortBy === 'name') {
+    } else if (sortBy === 'name' && !ranked) {
       filtered.sort((a, b) => a.name.localeCompare(b.name))
     }
     
     setFilteredMenu(filtered)
-  }, [menu, search, selectedCategory, selectedSubcategory, vegFilter, sortBy])
+  }, [menu, search, searchResults, selectedCategory, selectedSubcategory, vegFilter, sortBy])
   
   const handleAddToCart = (item, halfFull) => {
     const price = halfFull === 'half' ? item.price_half : item.price_full || item.price
@@ -212,10 +281,16 @@ export default function CustomerPage() {
         notes: formData.notes
       }
       
-      const orderResult = await createOrder(orderData)
+      const orderBody = JSON.stringify(orderData)
+      if (checkoutKeyRef.current?.body !== orderBody) {
+        checkoutKeyRef.current = { body: orderBody, key: newIdempotencyKey() }
+      }
+      const checkoutKey = checkoutKeyRef.current.key
+      
+      const orderResult = await createOrder(orderData, checkoutKey)
       setCurrentOrder(orderResult)
       
-      const paymentResult = await createPaymentOrder(orderResult.order_id, getTotal())
+      const paymentResult = await createPaymentOrder(orderResult.order_id, getTotal(), `${checkoutKey}:payment`)
       
       const options = {
         key: import.meta.env.VITE_RAZORPAY_KEY_ID || 'rzp_test_SEULnJj6ZBfPb4',
@@ -230,7 +305,7 @@ export default function CustomerPage() {
               razorpay_payment_id: response.razorpay_payment_id,
               razorpay_order_id: response.razorpay_order_id,
               razorpay_signature: response.razorpay_signature
-            })
+            }, `${checkoutKey}:verify`)
             setOrderPlaced(true)
             setCheckoutMode(false)
             clearCart()
@@ -144,7 +144,7 @@ export default function KitchenPage() {
       if (navigator.vibrate) {
         navigator.vibrate([200, 100, 200])
       }
-    } else if (data.type === 'order_updated' || data.type === 'payment_completed') {
+    } else if (data.type === 'order_updated' || data.type === 'orders_updated' || data.type === 'payment_completed' || data.type === 'resync') {
       fetchOrders()
     }
   }, [fetchOrders, soundEnabled])
@@ -27,6 +27,8 @@ export default function KitchenPanel() {
       if (data.type === 'new_order') {
         playSound()
         fetchOrders()
+      } else if (data.type === 'resync') {
+        fetchOrders()
       }
     })
     
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useCallback } from 'react'
 import { useParams, useNavigate } from 'react-router-dom'
 import { motion } from 'framer-motion'
 import { 
@@ -6,6 +6,7 @@ import {
   Truck, Download, Home, Utensils
 } from 'lucide-react'
 import { trackOrder, getBill } from '../lib/api'
+import useWebSocket from '../hooks/useWebSocket'
 import { useToastStore } from '../store/store'
 
 const statusSteps = [
@@ -47,6 +48,18 @@ export default function OrderStatusPage() {
     }
   }
 
+  // Status and payment changes are pushed over the customer socket - no polling
+  const handleWebSocketMessage = useCallback((data) => {
+    if (data.type === 'order_status' && data.order?.order_number === orderNumber) {
+      setOrder({ order: data.order, status_history: data.status_history })
+    } else if (data.type === 'resync' && orderNumber) {
+      // Missed pushes while the connection was backed up - reload the order
+      trackOrder(orderNumber).then(setOrder).catch(() => {})
+    }
+  }, [orderNumber])
+
+  useWebSocket('customer', orderNumber ? encodeURIComponent(orderNumber) : null, handleWebSocketMessage)
+
   const handleSearch = (e) => {
     e.preventDefault()
     if (searchNumber.trim()) {
@@ -207,6 +220,13 @@ export default function OrderStatusPage() {
                 <span className="text-gray-500 dark:text-gray-400">Time Elapsed</span>
                 <span className="font-medium text-gray-900 dark:text-white">{order.order.time_elapsed} mins</span>
               </div>
+
+              {order.order.eta_minutes != null && (
+                <div className="flex items-center justify-between text-sm">
+                  <span className="text-gray-500 dark:text-gray-400">Estimated Ready In</span>
+                  <span className="font-medium text-gray-900 dark:text-white">~{order.order.eta_minutes} mins</span>
+                </div>
+              )}
             </div>
 
             {/* Status Timeline */}
@@ -41,7 +41,7 @@ export default function Dashboard() {
   useEffect(() => { fetchData() }, [fetchData])
 
   const handleWebSocketMessage = useCallback((data) => {
-    if (data.type === 'new_order' || data.type === 'order_updated' || data.type === 'payment_completed') {
+    if (data.type === 'new_order' || data.type === 'order_updated' || data.type === 'orders_updated' || data.type === 'payment_completed' || data.type === 'resync') {
       fetchData()
     }
   }, [fetchData])
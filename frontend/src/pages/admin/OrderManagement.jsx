@@ -52,7 +52,7 @@ export default function OrderManagement() {
 
   // WebSocket for real-time updates
   const handleWebSocketMessage = useCallback((data) => {
-    if (data.type === 'new_order' || data.type === 'order_updated') {
+    if (data.type === 'new_order' || data.type === 'order_updated' || data.type === 'orders_updated' || data.type === 'resync') {
       fetchOrders()
     }
   }, [fetchOrders])
@@ -216,16 +216,6 @@ export const useWebSocketStore = create((set, get) => ({
     set({ connected: false, ws: null })
   },
   
-  subscribeToOrder: (orderId) => {
-    const { ws } = get()
-    if (ws && ws.readyState === WebSocket.OPEN) {
-      ws.send(JSON.stringify({
-        type: 'subscribe_order',
-        order_id: orderId
-      }))
-    }
-  },
-  
   setMessageHandler: (handler) => {
     const { ws } = get()
     if (ws) {